@@ -1,18 +1,48 @@
+import csv
 import json
 import re
 import subprocess
 import threading
+import time
+import tempfile
 import tkinter as tk
-from tkinter import messagebox, ttk
+from tkinter import filedialog, messagebox, ttk
 import tkinter.font as tkfont
 import sys
 import os
 import ctypes
-import winsound
 import webbrowser
+import heapq
+import io
+import zipfile
+import cProfile
+import pstats
+import tracemalloc
+import argparse
+import hmac
+import ipaddress
+import select
+import socket
+import socketserver
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
 from io import BytesIO
 from typing import Optional
-from PIL import Image, ImageDraw, ImageFont
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # only the window needs Pillow; fleet agents run without it
+    Image = ImageDraw = ImageFont = None
+
+try:
+    import winsound
+except ImportError:  # fleet agents may run on non-Windows test hosts
+    winsound = None
+
+try:
+    import psutil
+except ImportError:  # optional; /proc is used instead on Linux
+    psutil = None
 
 # ====================== App Constants ======================
 APP_NAME_VERSION = "Windows App Updater v1.1"
@@ -25,9 +55,11 @@ def resource_path(relative_path: str) -> str:
     return os.path.join(os.path.abspath("."), relative_path)
 
 # ====================== Hide child console windows ======================
-CREATE_NO_WINDOW = 0x08000000
+CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
 
-def _hidden_startupinfo() -> subprocess.STARTUPINFO:  # type: ignore[name-defined]
+def _hidden_startupinfo() -> Optional["subprocess.STARTUPINFO"]:  # type: ignore[name-defined]
+    if os.name != "nt":
+        return None
     si = subprocess.STARTUPINFO()  # type: ignore[attr-defined]
     si.dwFlags |= subprocess.STARTF_USESHOWWINDOW      # type: ignore[attr-defined]
     si.wShowWindow = 0  # SW_HIDE
@@ -210,16 +242,156 @@ def make_donate_image(width=160, height=44):
     return tk.PhotoImage(data=bio.read())
 
 
+# ====================== Profiling & diagnostics (--profile) ======================
+class Profiler:
+    """Opt-in timing spans, Tk event-loop lag, raw winget outputs and optional
+    cProfile/tracemalloc captures, all written to one diagnostics zip."""
+    MAX_RAW_OUTPUTS = 200
+    MAX_LAG_SAMPLES = 20000
+    MAX_SPANS = 50000
+
+    def __init__(self, cprofile: bool = False, trace_malloc: bool = False):
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = deque(maxlen=self.MAX_SPANS)
+        self.lag_samples = deque(maxlen=self.MAX_LAG_SAMPLES)
+        self.raw_outputs = deque(maxlen=self.MAX_RAW_OUTPUTS)
+        self.cprofile = None
+        if cprofile:
+            # Profiles the thread that enables it: the Tk main thread, where freezes happen
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        self.trace_malloc = trace_malloc
+        if trace_malloc:
+            tracemalloc.start(25)
+
+    def _now_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    @contextmanager
+    def span(self, name: str, **meta):
+        start = self._now_ms()
+        try:
+            yield
+        finally:
+            rec = {"name": name, "start_ms": round(start, 3), "duration_ms": round(self._now_ms() - start, 3),
+                   "thread": threading.current_thread().name}
+            if meta:
+                rec["meta"] = meta
+            with self._lock:
+                self.spans.append(rec)
+
+    def record_lag(self, lag_ms: float):
+        self.lag_samples.append((round(self._now_ms(), 1), round(lag_ms, 2)))
+
+    def record_output(self, cmd, code: int, out: str, err: str, duration_ms: float):
+        self.raw_outputs.append({"cmd": list(cmd), "code": code, "duration_ms": round(duration_ms, 3),
+                                 "stdout": out, "stderr": err})
+
+    def write_bundle(self, path: Optional[str] = None, log_tail=(), extra: Optional[dict] = None) -> str:
+        """Write everything collected so far to a zip and return its path."""
+        if not path:
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(app_data_dir(), "diagnostics", f"diagnostics-{stamp}.zip")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock:
+            spans = list(self.spans)
+        meta = {
+            "app": APP_NAME_VERSION,
+            "python": sys.version,
+            "platform": sys.platform,
+            "argv": sys.argv,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "duration_s": round(self._now_ms() / 1000, 3),
+            "is_admin": is_admin(),
+            "psutil": psutil is not None,
+        }
+        meta.update(extra or {})
+        with atomic_writer(path, binary=True) as f, zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as z:
+            z.writestr("meta.json", json.dumps(meta, indent=1, default=str))
+            z.writestr("spans.jsonl", "".join(json.dumps(s) + "\n" for s in spans))
+            z.writestr("loop_lag.csv", "t_ms,lag_ms\n" + "".join(f"{t},{lag}\n" for t, lag in list(self.lag_samples)))
+            z.writestr("log_tail.txt", "\n".join(log_tail) + "\n")
+            for i, rec in enumerate(list(self.raw_outputs)):
+                z.writestr(f"winget/{i:03d}.json", json.dumps(rec, ensure_ascii=False))
+            if self.cprofile:
+                self.cprofile.disable()
+                text = io.StringIO()
+                pstats.Stats(self.cprofile, stream=text).sort_stats("cumulative").print_stats(60)
+                z.writestr("cprofile.txt", text.getvalue())
+                fd, tmp = tempfile.mkstemp(suffix=".pstats")
+                os.close(fd)
+                try:
+                    self.cprofile.dump_stats(tmp)
+                    z.write(tmp, "cprofile.pstats")
+                finally:
+                    os.remove(tmp)
+                self.cprofile.enable()
+            if self.trace_malloc and tracemalloc.is_tracing():
+                snap = tracemalloc.take_snapshot()
+                top = snap.statistics("lineno")[:60]
+                z.writestr("tracemalloc.txt", "\n".join(str(s) for s in top) + "\n")
+        return path
+
+PROFILER: Optional[Profiler] = None
+
+def profile_span(name: str, **meta):
+    """Timing span when --profile is on, a no-op otherwise."""
+    if PROFILER is None:
+        return nullcontext()
+    return PROFILER.span(name, **meta)
+
+def replay_diagnostics(path: str):
+    """Re-run the parsers over the winget outputs stored in a diagnostics zip and time them.
+
+    The report is written next to the zip (<name>-replay.txt) and echoed to stdout
+    when there is one. Returns (report_path, results, failures).
+    """
+    results, lines = [], []
+    with zipfile.ZipFile(path) as z:
+        for name in sorted(n for n in z.namelist() if n.startswith("winget/")):
+            rec = json.loads(z.read(name).decode("utf-8"))
+            cmd, out = rec.get("cmd", []), rec.get("stdout", "")
+            if cmd[1:2] not in (["upgrade"], ["list"]) or "--id" in cmd or not out:
+                continue
+            parser = "json" if "json" in cmd else "table"
+            start = time.perf_counter()
+            try:
+                if parser == "json":
+                    items = normalize_winget_json(json.loads(out))
+                else:
+                    items = parse_table_upgrade_output(out)
+                status = f"{len(items)} package(s)"
+            except Exception as e:
+                status = f"error: {e}"
+            ms = (time.perf_counter() - start) * 1000
+            results.append((name, parser, len(out), ms, status))
+            lines.append(f"{name}  {parser:5}  {len(out):>9} bytes  {ms:9.2f} ms  {status}  ({' '.join(cmd)})")
+    failures = sum(1 for r in results if r[4].startswith("error:"))
+    lines.append(f"{len(results)} output(s) replayed, {failures} parse failure(s)")
+    report = os.path.splitext(path)[0] + "-replay.txt"
+    with atomic_writer(report) as f:
+        f.write("\n".join(lines) + "\n")
+    if sys.stdout is not None:
+        print("\n".join(lines), flush=True)
+    return report, results, failures
+
 # ====================== winget helpers ======================
 def run(cmd):
     env = os.environ.copy()
     env["DOTNET_CLI_UI_LANGUAGE"] = "en"
-    p = subprocess.run(
-        cmd, capture_output=True, text=True, shell=False,
-        encoding="utf-8", errors="replace", env=env,
-        startupinfo=_hidden_startupinfo(), creationflags=CREATE_NO_WINDOW
-    )
-    return p.returncode, p.stdout.strip(), p.stderr.strip()
+    start = time.perf_counter()
+    with profile_span("run", cmd=" ".join(cmd)):
+        p = subprocess.run(
+            cmd, capture_output=True, text=True, shell=False,
+            encoding="utf-8", errors="replace", env=env,
+            startupinfo=_hidden_startupinfo(), creationflags=CREATE_NO_WINDOW
+        )
+    out, err = p.stdout.strip(), p.stderr.strip()
+    if PROFILER is not None:
+        PROFILER.record_output(cmd, p.returncode, out, err, (time.perf_counter() - start) * 1000)
+    return p.returncode, out, err
 
 def try_json_parsers(include_unknown: bool):
     base = ["--accept-source-agreements", "--disable-interactivity", "--output", "json"]
@@ -234,8 +406,9 @@ def try_json_parsers(include_unknown: bool):
         code, out, err = run(cmd)
         if code == 0 and out:
             try:
-                data = json.loads(out)
-                return normalize_winget_json(data)
+                with profile_span("parse_json", cmd=" ".join(cmd), size=len(out)):
+                    data = json.loads(out)
+                    return normalize_winget_json(data)
             except Exception as e:
                 last_err = f"{err or ''}\nJSON parse error: {e}"
         else:
@@ -298,6 +471,10 @@ def parse_table_upgrade_output(text):
     return items
 
 def get_winget_upgrades(include_unknown: bool):
+    with profile_span("scan", include_unknown=include_unknown):
+        return _get_winget_upgrades(include_unknown)
+
+def _get_winget_upgrades(include_unknown: bool):
     code, _, _ = run(["winget", "--version"])
     if code != 0:
         raise RuntimeError("winget not found. Install the App Installer from Microsoft Store.")
@@ -310,11 +487,1012 @@ def get_winget_upgrades(include_unknown: bool):
         code, out, err = run(cmd)
         if code != 0:
             raise RuntimeError((err or str(e_json)).strip())
-        parsed = parse_table_upgrade_output(out)
+        with profile_span("parse_table", size=len(out)):
+            parsed = parse_table_upgrade_output(out)
         if parsed:
             return parsed
         raise RuntimeError(str(e_json))
 
+# ====================== winget exit codes ======================
+OUTCOME_SUCCESS   = "success"
+OUTCOME_RETRY     = "retryable"
+OUTCOME_ELEVATE   = "needs-elevation"
+OUTCOME_REBOOT    = "needs-reboot"
+OUTCOME_FATAL     = "fatal"
+OUTCOME_CANCELLED = "cancelled"
+
+HASH_MISMATCH = 0x8A150011
+
+# HRESULTs from winget's returnCodes.md, plus the Windows/MSI codes installers pass through.
+WINGET_EXIT_CODES = {
+    0x8A150061: (OUTCOME_SUCCESS, "Package is already installed"),
+    0x8A150008: (OUTCOME_RETRY,   "Downloading the installer failed"),
+    HASH_MISMATCH: (OUTCOME_RETRY, "Installer hash mismatch (stale cache)"),
+    0x8A150101: (OUTCOME_RETRY,   "Application is currently running"),
+    0x8A150102: (OUTCOME_RETRY,   "Another installation is already in progress"),
+    0x8A150103: (OUTCOME_RETRY,   "One or more files are in use"),
+    0x8A150107: (OUTCOME_RETRY,   "No network connection"),
+    0x8A150111: (OUTCOME_RETRY,   "Package is in use by another application"),
+    0x80072EE2: (OUTCOME_RETRY,   "Network request timed out"),
+    0x80072EE7: (OUTCOME_RETRY,   "Server name could not be resolved"),
+    0x80072EFD: (OUTCOME_RETRY,   "Cannot connect to the server"),
+    0x80072EFE: (OUTCOME_RETRY,   "Connection to the server was aborted"),
+    0x8A150019: (OUTCOME_ELEVATE, "Command requires administrator privileges"),
+    0x80070005: (OUTCOME_ELEVATE, "Access denied"),
+    0x800702E4: (OUTCOME_ELEVATE, "Operation requires elevation"),
+    740:        (OUTCOME_ELEVATE, "Operation requires elevation"),
+    0x8A150109: (OUTCOME_REBOOT,  "Restart your PC to finish installation"),
+    0x8A15010A: (OUTCOME_REBOOT,  "Installation failed; restart your PC and try again"),
+    0x8A15010B: (OUTCOME_REBOOT,  "Your PC will restart to finish installation"),
+    3010:       (OUTCOME_REBOOT,  "Restart required to finish installation"),
+    1641:       (OUTCOME_REBOOT,  "Installer initiated a restart"),
+    0x8A150010: (OUTCOME_FATAL,   "No applicable installer for this system"),
+    0x8A150014: (OUTCOME_FATAL,   "No package found"),
+    0x8A15002B: (OUTCOME_FATAL,   "No applicable upgrade found"),
+    0x8A150104: (OUTCOME_FATAL,   "A dependency is missing"),
+    0x8A150105: (OUTCOME_FATAL,   "Not enough disk space"),
+    0x8A150106: (OUTCOME_FATAL,   "Not enough memory"),
+    0x8A150108: (OUTCOME_FATAL,   "Installer failed; contact support"),
+    0x8A15010C: (OUTCOME_FATAL,   "Installation cancelled"),
+    0x8A15010D: (OUTCOME_FATAL,   "Another version is already installed"),
+    0x8A15010E: (OUTCOME_FATAL,   "A newer version is already installed"),
+    0x8A15010F: (OUTCOME_FATAL,   "Blocked by organization policy"),
+    0x8A150110: (OUTCOME_FATAL,   "Failed to install package dependencies"),
+    0x8A150112: (OUTCOME_FATAL,   "Invalid installer parameter"),
+    0x8A150113: (OUTCOME_FATAL,   "Package not supported by this system"),
+    0x8A150114: (OUTCOME_FATAL,   "Installer does not support upgrading"),
+}
+
+def classify_winget_exit(code: int):
+    """Map a winget exit code to (outcome, description)."""
+    code &= 0xFFFFFFFF  # HRESULTs may come back signed
+    if code == 0:
+        return OUTCOME_SUCCESS, "Success"
+    return WINGET_EXIT_CODES.get(code, (OUTCOME_FATAL, "Unknown error"))
+
+# ====================== winget upgrade (streaming + retry) ======================
+RETRY_MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 2.0  # seconds, doubled after every retryable failure
+
+def build_upgrade_cmd(pkg_id: str, include_unknown: bool):
+    cmd = [
+        "winget", "upgrade", "--id", pkg_id,
+        "--accept-package-agreements", "--accept-source-agreements",
+        "--disable-interactivity", "-h"
+    ]
+    if include_unknown:
+        cmd.insert(2, "--include-unknown")
+    return cmd
+
+def stream_winget_upgrade(pkg_id: str, include_unknown: bool, on_line,
+                          should_cancel=lambda: False, on_start=None) -> int:
+    """Run one `winget upgrade`, pass visible output lines to on_line and return the exit code."""
+    proc = subprocess.Popen(
+        build_upgrade_cmd(pkg_id, include_unknown),
+        shell=False, text=True,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        startupinfo=_hidden_startupinfo(),
+        creationflags=CREATE_NO_WINDOW
+    )
+    if on_start:
+        on_start(proc)
+    spinner_re = re.compile(r"^[\s\\/\|\-\r]+$")
+    while True:
+        if should_cancel():
+            kill_process_tree(proc)
+        line = proc.stdout.readline()
+        if not line:
+            break
+        ln = line.rstrip()
+        if ln and not spinner_re.match(ln):
+            on_line(ln)
+    _, err = proc.communicate()
+    if err and err.strip():
+        on_line(err.strip())
+    return proc.returncode & 0xFFFFFFFF
+
+def _sleep_unless_cancelled(seconds: float, should_cancel) -> bool:
+    """Sleep in small slices; return True if cancellation was requested meanwhile."""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if should_cancel():
+            return True
+        time.sleep(0.2)
+    return should_cancel()
+
+def upgrade_with_retry(pkg_id: str, include_unknown: bool, on_line,
+                       should_cancel=lambda: False, on_start=None):
+    """Upgrade one package, retrying transient failures with exponential backoff.
+
+    Returns (outcome, exit_code, attempts).
+    """
+    delay = RETRY_BASE_DELAY
+    attempt = 0
+    while True:
+        attempt += 1
+        code = stream_winget_upgrade(pkg_id, include_unknown, on_line, should_cancel, on_start)
+        if should_cancel():
+            return OUTCOME_CANCELLED, code, attempt
+        outcome, reason = classify_winget_exit(code)
+        if outcome != OUTCOME_RETRY or attempt >= RETRY_MAX_ATTEMPTS:
+            return outcome, code, attempt
+        on_line(f"{reason} (0x{code:08X}); retrying in {delay:g}s "
+                f"(attempt {attempt + 1}/{RETRY_MAX_ATTEMPTS})...")
+        if code == HASH_MISMATCH:
+            run(["winget", "source", "update"])
+        if _sleep_unless_cancelled(delay, should_cancel):
+            return OUTCOME_CANCELLED, code, attempt
+        delay *= 2
+
+def describe_outcome(pkg_id: str, outcome: str, code: Optional[int], attempts: int) -> str:
+    """One log line summarising how an upgrade ended."""
+    tries = f" after {attempts} attempts" if attempts > 1 else ""
+    if outcome == OUTCOME_CANCELLED:
+        return f"■ Cancelled {pkg_id}"
+    if code is None:
+        return f"✖ Failed {pkg_id}"
+    reason = classify_winget_exit(code)[1]
+    if outcome == OUTCOME_SUCCESS:
+        return f"✔ Finished {pkg_id}{tries}"
+    if outcome == OUTCOME_REBOOT:
+        return f"✔ Finished {pkg_id}{tries} — {reason}"
+    if outcome == OUTCOME_ELEVATE:
+        return f"⚠ {pkg_id} needs administrator rights (0x{code:08X})"
+    return f"✖ Failed {pkg_id}{tries}: {reason} (0x{code:08X})"
+
+def run_elevated_batch(cmds):
+    """Run several winget commands in one elevated cmd.exe (a single UAC prompt) and wait.
+
+    Returns one exit code per command, or None for commands that never ran
+    (e.g. because the prompt was declined).
+    """
+    fd, script = tempfile.mkstemp(prefix="winget-elevated-", suffix=".cmd")
+    os.close(fd)
+    fd, results = tempfile.mkstemp(prefix="winget-elevated-", suffix=".txt")
+    os.close(fd)
+    try:
+        with open(script, "w", encoding="utf-8") as f:
+            f.write("@echo off\r\n")
+            for cmd in cmds:
+                f.write(subprocess.list2cmdline(cmd) + "\r\n")
+                # Redirection first, so a one-digit code is not read as a handle number
+                f.write(f'>>"{results}" echo %errorlevel%\r\n')
+        quoted = script.replace("'", "''")
+        ps = (f"$p = Start-Process -FilePath cmd.exe -ArgumentList '/c \"{quoted}\"' "
+              f"-Verb RunAs -WindowStyle Hidden -Wait -PassThru; exit $p.ExitCode")
+        run(["powershell", "-NoProfile", "-NonInteractive", "-Command", ps])
+        codes = []
+        with open(results, encoding="utf-8", errors="replace") as f:
+            for ln in f:
+                try:
+                    codes.append(int(ln.strip()) & 0xFFFFFFFF)
+                except ValueError:
+                    codes.append(None)
+        return (codes + [None] * len(cmds))[:len(cmds)]
+    finally:
+        for path in (script, results):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+# ====================== Fleet mode (coordinator <-> agents) ======================
+# Newline-delimited JSON over TCP. The coordinator sends one request per line
+# ({"op": "ping" | "scan" | "upgrade", "token": ..., ...}); the agent answers with
+# a stream of {"event": ...} lines ending in {"event": "end"} or {"event": "error"}.
+# Connections stay open between requests so the coordinator can pool them.
+FLEET_DEFAULT_PORT = 8765
+FLEET_PER_HOST_LIMIT = 2     # concurrent requests per agent
+FLEET_CONNECT_TIMEOUT = 10.0
+FLEET_IDEMPOTENT_OPS = ("ping", "scan")   # safe to resend on a fresh connection
+
+def parse_host_port(text: str, default_port: int = FLEET_DEFAULT_PORT):
+    host, sep, port = text.strip().rpartition(":")
+    if not sep:
+        return text.strip(), default_port
+    return host, int(port)
+
+class FleetAgentHandler(socketserver.StreamRequestHandler):
+    def send(self, **event):
+        self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def peer_closed(self) -> bool:
+        """True once the coordinator hung up (its way of cancelling a request)."""
+        try:
+            readable, _, _ = select.select([self.connection], [], [], 0)
+            return bool(readable) and self.connection.recv(1, socket.MSG_PEEK) == b""
+        except OSError:
+            return True
+
+    def handle(self):
+        for raw in self.rfile:
+            try:
+                req = json.loads(raw)
+            except ValueError:
+                self.send(event="error", message="malformed request")
+                return
+            if not self.server.authorized(req.get("token")):
+                self.send(event="error", message="unauthorized")
+                return
+            try:
+                self.dispatch(req)
+            except (ConnectionError, OSError):
+                return
+            except Exception as e:
+                self.send(event="error", message=str(e))
+
+    def dispatch(self, req: dict):
+        op = req.get("op")
+        if op == "ping":
+            self.send(event="end", host=socket.gethostname())
+        elif op == "scan":
+            items = get_winget_upgrades(include_unknown=bool(req.get("include_unknown")))
+            self.send(event="packages", items=items)
+            self.send(event="end")
+        elif op == "upgrade":
+            self.upgrade(req["id"], bool(req.get("include_unknown")))
+        else:
+            self.send(event="error", message=f"unknown op: {op!r}")
+
+    def upgrade(self, pkg_id: str, include_unknown: bool):
+        server = self.server
+        if not server.can_start(pkg_id):
+            self.send(event="log", line="Waiting for system resources...")
+        if not server.acquire(pkg_id, self.peer_closed):
+            return  # coordinator hung up while we were waiting
+        try:
+            self._upgrade(pkg_id, include_unknown)
+        finally:
+            server.release(pkg_id)
+
+    def _upgrade(self, pkg_id: str, include_unknown: bool):
+        monitor = self.server.monitor
+        state = {"cancelled": False, "proc": None, "done": False}
+
+        def on_start(proc):
+            state["proc"] = proc
+            monitor.track(pkg_id, proc.pid)
+
+        def watch():
+            while not state["done"]:
+                if self.peer_closed():
+                    state["cancelled"] = True
+                    kill_process_tree(state["proc"])
+                    return
+                time.sleep(0.5)
+
+        def on_line(line):
+            try:
+                self.send(event="log", line=line)
+            except OSError:
+                state["cancelled"] = True
+
+        threading.Thread(target=watch, daemon=True).start()
+        try:
+            outcome, code, attempts = upgrade_with_retry(
+                pkg_id, include_unknown, on_line,
+                should_cancel=lambda: state["cancelled"],
+                on_start=on_start,
+            )
+        finally:
+            state["done"] = True
+            peak = monitor.untrack(pkg_id)
+            monitor.save_history()
+        self.send(event="result", id=pkg_id, outcome=outcome, code=code, attempts=attempts, peak=peak)
+        self.send(event="end")
+
+class FleetAgentServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, token: Optional[str] = None, monitor: Optional["ResourceMonitor"] = None):
+        super().__init__(address, FleetAgentHandler)
+        self.token = token
+        # Same admission as local upgrades (ResourceMonitor.try_start): --max-parallel, CPU/memory limits,
+        # spaced starts, heavy installers apart
+        self.monitor = monitor or ResourceMonitor()
+        self.monitor.start()
+        self.running = []
+        self._admission = threading.Condition()
+
+    def can_start(self, pkg_id: str) -> bool:
+        with self._admission:
+            return self.monitor.can_start(pkg_id, self.running)
+
+    def acquire(self, pkg_id: str, should_cancel) -> bool:
+        """Block until pkg_id may start on this host; False if cancelled meanwhile."""
+        with self._admission:
+            while not should_cancel():
+                if self.monitor.try_start(pkg_id, self.running):
+                    self.running.append(pkg_id)
+                    return True
+                self._admission.wait(0.5)
+            return False
+
+    def release(self, pkg_id: str):
+        with self._admission:
+            self.running.remove(pkg_id)
+            self._admission.notify_all()
+
+    def server_close(self):
+        self.monitor.stop()
+        super().server_close()
+
+    def authorized(self, token) -> bool:
+        if not self.token:
+            return True
+        return isinstance(token, str) and hmac.compare_digest(token, self.token)
+
+def is_loopback_host(host: str) -> bool:
+    if host.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False
+
+def run_fleet_agent(listen: str, token: Optional[str] = None, monitor: Optional["ResourceMonitor"] = None):
+    """Serve scan/upgrade requests for a fleet coordinator until interrupted."""
+    host, port = parse_host_port(listen)
+    if not token and not is_loopback_host(host):
+        # Agents run installers as admin; never take orders from the whole network unauthenticated
+        raise SystemExit(f"Refusing to listen on {host}:{port} without --token "
+                         f"(or APP_UPDATER_TOKEN); only loopback addresses may run without one.")
+    with FleetAgentServer((host, port), token, monitor) as server:
+        print(f"{APP_NAME_VERSION} agent listening on {host}:{port}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+class FleetConnectionPool:
+    """Persistent connections to one agent; `limit` is also its concurrency limit."""
+    def __init__(self, address, token: Optional[str] = None, limit: int = FLEET_PER_HOST_LIMIT):
+        self.address = address
+        self.token = token
+        self._slots = threading.BoundedSemaphore(max(1, limit))
+        self._lock = threading.Lock()
+        self._idle = []
+        self._busy = set()
+        self._aborts = 0   # bumped by abort(); requests started before it must not reconnect
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=FLEET_CONNECT_TIMEOUT)
+        sock.settimeout(None)
+        return sock, sock.makefile("rb")
+
+    def request(self, payload: dict, on_event=lambda ev: None) -> dict:
+        """Send one request, pass intermediate events to on_event and return the final one."""
+        payload = dict(payload, token=self.token)
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        with self._slots:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+                aborts = self._aborts
+            reused = conn is not None
+            if conn is None:
+                conn = self._connect()
+            with self._lock:
+                self._busy.add(conn)
+            finished = False
+            try:
+                sent = False
+                try:
+                    conn[0].sendall(data)
+                    sent = True
+                    line = conn[1].readline()
+                except OSError:
+                    line = b""
+                # A pooled connection may have gone stale (agent restarted): retry once on a
+                # fresh one, but only if the agent cannot have started the request already and
+                # nobody hung up on purpose (abort() also ends in an empty read).
+                if not line and reused and (not sent or payload.get("op") in FLEET_IDEMPOTENT_OPS):
+                    self._discard(conn)
+                    with self._lock:
+                        if self._aborts != aborts:
+                            raise ConnectionError("request aborted")
+                    conn = self._connect()
+                    with self._lock:
+                        self._busy.add(conn)
+                        if self._aborts != aborts:
+                            raise ConnectionError("request aborted")
+                    conn[0].sendall(data)
+                    line = conn[1].readline()
+                while line:
+                    ev = json.loads(line)
+                    if ev.get("event") in ("end", "error"):
+                        finished = ev.get("event") == "end"
+                        return ev
+                    on_event(ev)
+                    line = conn[1].readline()
+                raise ConnectionError(f"agent {self.address[0]}:{self.address[1]} closed the connection")
+            finally:
+                if finished:
+                    with self._lock:
+                        self._busy.discard(conn)
+                        self._idle.append(conn)
+                else:
+                    self._discard(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._busy.discard(conn)
+        for f in (conn[1], conn[0]):
+            try:
+                f.close()
+            except OSError:
+                pass
+
+    def abort(self):
+        """Hang up on in-flight requests; agents terminate the upgrades they were running."""
+        with self._lock:
+            self._aborts += 1
+            busy = list(self._busy)
+        for sock, _ in busy:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+class FleetCoordinator:
+    """Fan scans and upgrades out to several agents and stream the results back."""
+    def __init__(self, hosts, token: Optional[str] = None, per_host_limit: int = FLEET_PER_HOST_LIMIT):
+        self.pools = {}
+        for h in hosts:
+            addr = parse_host_port(h)
+            self.pools[f"{addr[0]}:{addr[1]}"] = FleetConnectionPool(addr, token, per_host_limit)
+        self.per_host_limit = max(1, per_host_limit)
+        self.cancel_requested = False
+
+    def scan(self, include_unknown: bool, on_packages, on_error):
+        """Scan every host in parallel; callbacks run on worker threads as hosts finish."""
+        def one(host, pool):
+            try:
+                items = []
+                with profile_span("fleet_scan", host=host):
+                    ev = pool.request({"op": "scan", "include_unknown": include_unknown},
+                                      lambda e: items.extend(e.get("items", [])))
+                if ev.get("event") == "error":
+                    raise RuntimeError(ev.get("message") or "agent error")
+                on_packages(host, items)
+            except Exception as e:
+                on_error(host, e)
+        self._run_all([(one, (h, p)) for h, p in self.pools.items()])
+
+
+    def upgrade(self, targets, on_log, on_result):
+        """Upgrade (host, pkg_id, include_unknown) targets, at most per_host_limit at once per host.
+
+        on_log(host, line) and on_result(host, pkg_id, outcome, code, attempts, peak) run on worker threads;
+        peak is the agent's peak resource use for the package (None if unknown).
+        """
+        self.cancel_requested = False
+        queues = {}
+        for host, pkg_id, include_unknown in targets:
+            if host not in self.pools:
+                on_log(host, f"Skipping {pkg_id}: host is not part of this fleet")
+                on_result(host, pkg_id, OUTCOME_FATAL, None, 1, None)
+                continue
+            queues.setdefault(host, deque()).append((pkg_id, include_unknown))
+        jobs = []
+        for host, queue in queues.items():
+            for _ in range(min(self.per_host_limit, len(queue))):
+                jobs.append((self._drain, (host, queue, on_log, on_result)))
+        self._run_all(jobs)
+
+    def _drain(self, host, queue, on_log, on_result):
+        pool = self.pools[host]
+        while not self.cancel_requested:
+            try:
+                pkg_id, include_unknown = queue.popleft()
+            except IndexError:
+                return
+            results = []
+
+            def on_event(ev):
+                if ev.get("event") == "log":
+                    on_log(host, ev.get("line", ""))
+                elif ev.get("event") == "result":
+                    results.append((ev.get("outcome", OUTCOME_FATAL), ev.get("code"), ev.get("attempts", 1),
+                                    ev.get("peak")))
+
+            outcome, code, attempts, peak = OUTCOME_FATAL, None, 1, None
+            try:
+                with profile_span("fleet_upgrade", host=host, id=pkg_id):
+                    ev = pool.request({"op": "upgrade", "id": pkg_id, "include_unknown": include_unknown}, on_event)
+                if ev.get("event") == "error":
+                    on_log(host, f"Error: {ev.get('message')}")
+                elif results:
+                    outcome, code, attempts, peak = results[-1]
+            except Exception as e:
+                if self.cancel_requested:
+                    outcome = OUTCOME_CANCELLED
+                else:
+                    on_log(host, f"Error: {e}")
+            on_result(host, pkg_id, outcome, code, attempts, peak)
+
+    def cancel(self):
+        self.cancel_requested = True
+        for pool in self.pools.values():
+            pool.abort()
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
+
+    @staticmethod
+    def _run_all(jobs):
+        threads = [threading.Thread(target=fn, args=args, daemon=True) for fn, args in jobs]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+# ====================== Export / import (CSV, JSON Lines, binary) ======================
+PACKAGE_FIELDS = ("host", "name", "id", "current", "available")
+OUTCOME_FIELDS = ("host", "id", "outcome", "code", "attempts", "finished_at",
+                  "peak_cpu_percent", "peak_rss_bytes", "peak_io_bytes_per_s")
+EXPORT_BUFFER = 1 << 16
+WAU_MAGIC = b"WAU1"   # compact binary: magic, field names, then length-prefixed UTF-8 cells
+EXPORT_FILETYPES = [
+    ("CSV", "*.csv"),
+    ("JSON Lines", "*.jsonl"),
+    ("Compact binary", "*.wau"),
+]
+
+def _export_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in (".csv", ".jsonl", ".wau"):
+        raise ValueError(f"Unsupported file type '{ext or path}'. Use .csv, .jsonl or .wau")
+    return ext
+
+def _replacement_mode(path: str) -> int:
+    """Permissions for a file replacing `path`: the existing file's, else the umask default."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+@contextmanager
+def atomic_writer(path: str, binary: bool = False):
+    """Buffered file writer that only replaces `path` once everything was written."""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".export-", dir=folder)  # mkstemp files are owner-only
+    try:
+        if binary:
+            f = os.fdopen(fd, "wb", buffering=EXPORT_BUFFER)
+        else:
+            f = os.fdopen(fd, "w", buffering=EXPORT_BUFFER, encoding="utf-8", newline="")
+        with f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, _replacement_mode(path))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+def _write_uvarint(f, n: int):
+    while n >= 0x80:
+        f.write(bytes(((n & 0x7F) | 0x80,)))
+        n >>= 7
+    f.write(bytes((n,)))
+
+def _read_uvarint(f) -> Optional[int]:
+    """Next unsigned varint, or None at a clean end of file."""
+    shift = n = 0
+    while True:
+        b = f.read(1)
+        if not b:
+            if shift:
+                raise ValueError("Truncated binary export")
+            return None
+        n |= (b[0] & 0x7F) << shift
+        if b[0] < 0x80:
+            return n
+        shift += 7
+
+def _write_cell(f, value):
+    data = ("" if value is None else str(value)).encode("utf-8")
+    _write_uvarint(f, len(data))
+    f.write(data)
+
+def _read_cell(f) -> str:
+    n = _read_uvarint(f)
+    data = f.read(n) if n else b""
+    if n is None or len(data) != n:
+        raise ValueError("Truncated binary export")
+    return data.decode("utf-8")
+
+def export_records(path: str, fields, records) -> int:
+    """Stream records (dicts) to path as CSV, JSON Lines or binary; return the row count."""
+    fmt = _export_format(path)
+    count = 0
+    with atomic_writer(path, binary=(fmt == ".wau")) as f:
+        if fmt == ".csv":
+            w = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            w.writeheader()
+            for rec in records:
+                w.writerow(rec)
+                count += 1
+        elif fmt == ".jsonl":
+            for rec in records:
+                f.write(json.dumps({k: rec.get(k, "") for k in fields}, ensure_ascii=False) + "\n")
+                count += 1
+        else:
+            f.write(WAU_MAGIC)
+            _write_uvarint(f, len(fields))
+            for name in fields:
+                _write_cell(f, name)
+            for rec in records:
+                for name in fields:
+                    _write_cell(f, rec.get(name, ""))
+                count += 1
+    return count
+
+def iter_records(path: str):
+    """Yield dicts from a CSV, JSON Lines or binary export, one row at a time."""
+    fmt = _export_format(path)
+    if fmt == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+    elif fmt == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            for ln in f:
+                if ln.strip():
+                    yield json.loads(ln)
+    else:
+        with open(path, "rb", buffering=EXPORT_BUFFER) as f:
+            if f.read(len(WAU_MAGIC)) != WAU_MAGIC:
+                raise ValueError("Not a Windows App Updater binary export")
+            n_fields = _read_uvarint(f) or 0
+            fields = [_read_cell(f) for _ in range(n_fields)]
+            while fields:
+                n = _read_uvarint(f)
+                if n is None:
+                    return
+                data = f.read(n)
+                if len(data) != n:
+                    raise ValueError("Truncated binary export")
+                rec = {fields[0]: data.decode("utf-8")}
+                for name in fields[1:]:
+                    rec[name] = _read_cell(f)
+                yield rec
+
+def iter_package_rows(path: str):
+    """Imported package rows normalised to the shape get_winget_upgrades returns."""
+    for rec in iter_records(path):
+        pkg_id = (rec.get("id") or rec.get("Id") or "").strip()
+        if not pkg_id:
+            continue
+        yield {
+            "host":      rec.get("host") or "",
+            "name":      rec.get("name") or pkg_id,
+            "id":        pkg_id,
+            "current":   rec.get("current") or "",
+            "available": rec.get("available") or "",
+        }
+
+# ====================== Process-tree resource monitor ======================
+RESOURCE_SAMPLE_INTERVAL = 1.0   # seconds
+MAX_CONCURRENT_UPGRADES = 1
+ADMIT_CPU_PERCENT = 75.0         # start another upgrade only while system CPU is below this
+ADMIT_MEM_PERCENT = 85.0         # ... and memory use is below this
+HEAVY_RSS_BYTES = 500 * 1024 * 1024   # past peaks above these mark an installer as heavy
+HEAVY_CPU_PERCENT = 100.0             # one full core
+
+def app_data_dir() -> str:
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "WindowsAppUpdater")
+
+RESOURCE_HISTORY_FILE = os.path.join(app_data_dir(), "resource_history.json")
+
+def _fmt_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+def _proc_stat(pid: int):
+    """(ppid, cpu_seconds) from /proc/<pid>/stat."""
+    with open(f"/proc/{pid}/stat", "rb") as f:
+        data = f.read().decode("ascii", "replace")
+    rest = data[data.rfind(")") + 2:].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    return int(rest[1]), (int(rest[11]) + int(rest[12])) / ticks
+
+def process_tree_pids(pid: int):
+    """pid plus all of its descendants (best effort; just [pid] when unsupported)."""
+    if psutil is not None:
+        try:
+            return [pid] + [c.pid for c in psutil.Process(pid).children(recursive=True)]
+        except psutil.Error:
+            return [pid]
+    if not os.path.isdir("/proc"):
+        return [pid]
+    children = {}
+    for name in os.listdir("/proc"):
+        if name.isdigit():
+            try:
+                children.setdefault(_proc_stat(int(name))[0], []).append(int(name))
+            except (OSError, ValueError, IndexError):
+                pass
+    pids, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        pids.append(p)
+        todo.extend(children.get(p, ()))
+    return pids
+
+def sample_pid(pid: int):
+    """(cpu_seconds, rss_bytes, io_bytes) for one process, or None if it is gone."""
+    if psutil is not None:
+        try:
+            p = psutil.Process(pid)
+            with p.oneshot():
+                t = p.cpu_times()
+                rss = p.memory_info().rss
+                try:
+                    io = p.io_counters()
+                    io_bytes = io.read_bytes + io.write_bytes
+                except (psutil.AccessDenied, AttributeError):
+                    io_bytes = 0
+            return t.user + t.system, rss, io_bytes
+        except psutil.Error:
+            return None
+    try:
+        _, cpu = _proc_stat(pid)
+        with open(f"/proc/{pid}/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+    io_bytes = 0
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            for ln in f:
+                key, _, val = ln.partition(":")
+                if key in ("read_bytes", "write_bytes"):
+                    io_bytes += int(val)
+    except (OSError, ValueError):
+        pass
+    return cpu, rss, io_bytes
+
+def kill_process_tree(proc):
+    """Stop an upgrade together with every installer it spawned."""
+    if proc is None or proc.poll() is not None:
+        return
+    if psutil is not None:
+        try:
+            root = psutil.Process(proc.pid)
+            procs = root.children(recursive=True) + [root]
+            for p in procs:
+                try:
+                    p.kill()
+                except psutil.Error:
+                    pass
+            return
+        except psutil.Error:
+            pass
+    elif os.name == "nt":
+        try:
+            subprocess.run(["taskkill", "/T", "/F", "/PID", str(proc.pid)], capture_output=True,
+                           startupinfo=_hidden_startupinfo(), creationflags=CREATE_NO_WINDOW)
+            return
+        except Exception:
+            pass
+    else:
+        for pid in reversed(process_tree_pids(proc.pid)):
+            try:
+                os.kill(pid, 15)  # SIGTERM
+            except OSError:
+                pass
+        return
+    try:
+        proc.terminate()
+    except Exception:
+        pass
+
+class ResourceMonitor:
+    """Samples the whole process tree of every running upgrade on a background thread.
+
+    Keeps live usage and per-run peaks per package, the system load used to admit
+    further concurrent upgrades, and a persisted history of peaks so heavy installers
+    can be kept apart on later runs.
+    """
+    def __init__(self, max_parallel: int = MAX_CONCURRENT_UPGRADES,
+                 cpu_limit: float = ADMIT_CPU_PERCENT, mem_limit: float = ADMIT_MEM_PERCENT,
+                 history_path: str = RESOURCE_HISTORY_FILE):
+        self.max_parallel = max(1, max_parallel)
+        self.cpu_limit = cpu_limit
+        self.mem_limit = mem_limit
+        self.history_path = history_path
+        self.history = self._load_history()
+        self.usage = {}    # pkg_id -> {"cpu": %, "rss": bytes, "io": bytes/s}
+        self.peaks = {}    # pkg_id -> same keys, maxima of the upgrade in progress
+        self.system = None # (cpu %, mem %) or None when unknown
+        self.on_sample = None
+        self._lock = threading.Lock()
+        self._roots = {}   # pkg_id -> root pid
+        self._prev = {}    # pkg_id -> (time, {pid: (cpu_s, io_bytes)})
+        self._sys_prev = None
+        self._last_start = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def available(self) -> bool:
+        return psutil is not None or os.path.isdir("/proc")
+
+    # ----- tracking -----
+    def track(self, pkg_id: str, pid: int):
+        with self._lock:
+            self._roots[pkg_id] = pid
+            self._prev.pop(pkg_id, None)
+            self.peaks.setdefault(pkg_id, {"cpu": 0.0, "rss": 0, "io": 0.0})
+
+    def untrack(self, pkg_id: str) -> Optional[dict]:
+        """Stop sampling pkg_id; return its peak usage for this run and record it in the history.
+
+        Retries of one upgrade share a peak (track() keeps it); the next run starts from zero.
+        """
+        with self._lock:
+            self._roots.pop(pkg_id, None)
+            self._prev.pop(pkg_id, None)
+            self.usage.pop(pkg_id, None)
+            peak = self.peaks.pop(pkg_id, None)
+            if peak and peak["rss"]:
+                self.history[pkg_id] = dict(peak, updated=datetime.now().isoformat(timespec="seconds"))
+            return peak
+
+    def is_heavy(self, pkg_id: str) -> bool:
+        h = self.history.get(pkg_id) or {}
+        return h.get("rss", 0) >= HEAVY_RSS_BYTES or h.get("cpu", 0) >= HEAVY_CPU_PERCENT
+
+    # ----- admission (local upgrades and fleet agents alike) -----
+    def can_start(self, pkg_id: str, running) -> bool:
+        """May pkg_id start next to the `running` package ids right now?
+
+        Starts are spaced two samples apart so the previous one shows up in the system
+        load first, admit() must agree, and two installers that were heavy on earlier
+        runs are never started side by side.
+        """
+        if running and time.monotonic() - self._last_start < 2 * RESOURCE_SAMPLE_INTERVAL:
+            return False
+        if not self.admit(len(running)):
+            return False
+        return not (self.is_heavy(pkg_id) and any(self.is_heavy(p) for p in running))
+
+    def try_start(self, pkg_id: str, running) -> bool:
+        """can_start(), and if so count pkg_id as started now (for the spacing)."""
+        if not self.can_start(pkg_id, running):
+            return False
+        self._last_start = time.monotonic()
+        return True
+
+    def pick_next(self, queue: deque, running):
+        """Pop and start the first target in queue (pkg_id first) that try_start() admits."""
+        for i, target in enumerate(queue):
+            if self.try_start(target[0], running):
+                del queue[i]
+                return target
+        return None
+
+    def admit(self, running: int) -> bool:
+        """May another upgrade start next to `running` ones?"""
+        if running == 0:
+            return True
+        if running >= self.max_parallel:
+            return False
+        if self.system is None:
+            return True
+        cpu, mem = self.system
+        return cpu < self.cpu_limit and mem < self.mem_limit
+
+    # ----- sampling -----
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(RESOURCE_SAMPLE_INTERVAL):
+            try:
+                self.sample()
+            except Exception:
+                pass
+            if self.on_sample:
+                self.on_sample(self)
+
+    def sample(self):
+        now = time.monotonic()
+        with self._lock:
+            roots = dict(self._roots)
+        for pkg_id, root in roots.items():
+            per_pid, rss = {}, 0
+            for pid in process_tree_pids(root):
+                s = sample_pid(pid)
+                if s:
+                    per_pid[pid] = (s[0], s[2])
+                    rss += s[1]
+            with self._lock:
+                if pkg_id not in self._roots:
+                    continue
+                prev = self._prev.get(pkg_id)
+                self._prev[pkg_id] = (now, per_pid)
+                if not prev:
+                    continue
+                dt = max(now - prev[0], 1e-6)
+                cpu = sum(c - prev[1][p][0] for p, (c, _) in per_pid.items() if p in prev[1])
+                io = sum(i - prev[1][p][1] for p, (_, i) in per_pid.items() if p in prev[1])
+                usage = {"cpu": max(0.0, cpu / dt * 100), "rss": rss, "io": max(0.0, io / dt)}
+                self.usage[pkg_id] = usage
+                peak = self.peaks.setdefault(pkg_id, {"cpu": 0.0, "rss": 0, "io": 0.0})
+                for k, v in usage.items():
+                    peak[k] = max(peak[k], v)
+        self.system = self._system_load()
+
+    def _system_load(self):
+        if psutil is not None:
+            return psutil.cpu_percent(None), psutil.virtual_memory().percent
+        try:
+            with open("/proc/stat") as f:
+                vals = [int(v) for v in f.readline().split()[1:]]
+            with open("/proc/meminfo") as f:
+                mem = {ln.split(":")[0]: int(ln.split()[1]) for ln in f}
+        except (OSError, ValueError, IndexError):
+            return None
+        idle, total = vals[3] + (vals[4] if len(vals) > 4 else 0), sum(vals)
+        prev, self._sys_prev = self._sys_prev, (idle, total)
+        cpu = 0.0 if not prev or total == prev[1] else 100.0 * (1 - (idle - prev[0]) / (total - prev[1]))
+        mem_pct = 100.0 * (1 - mem.get("MemAvailable", 0) / max(mem.get("MemTotal", 1), 1))
+        return cpu, mem_pct
+
+    def describe(self) -> str:
+        """One status line: live usage per running package plus system load."""
+        with self._lock:
+            parts = [f"{pid}: CPU {u['cpu']:.0f}% • RSS {_fmt_bytes(u['rss'])} • I/O {_fmt_bytes(u['io'])}/s"
+                     for pid, u in self.usage.items()]
+        if self.system:
+            parts.append(f"System CPU {self.system[0]:.0f}% • MEM {self.system[1]:.0f}%")
+        return "   |   ".join(parts)
+
+    # ----- history -----
+    def _load_history(self) -> dict:
+        try:
+            with open(self.history_path, encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save_history(self):
+        try:
+            os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
+            with self._lock:
+                text = json.dumps(self.history, indent=1, sort_keys=True)
+            with atomic_writer(self.history_path) as f:
+                f.write(text)
+        except OSError:
+            pass
+
 # ====================== Checkbox images (drawn at runtime) ======================
 def make_checkbox_images(size: int = 16):
     """Create simple checkbox PNGs at runtime (no external files)."""
@@ -337,19 +1515,161 @@ def make_checkbox_images(size: int = 16):
         checked.put(mark, to=(x, y - 1, x + 1, y))
     return unchecked, checked
 
+# ====================== Column auto-fit ======================
+AUTOFIT_PAD = 24          # pixels around the widest text
+AUTOFIT_CANDIDATES = 64   # longest strings per column that actually get measured
+AUTOFIT_MAX_WIDTH = 640   # cap when sizing columns automatically after a scan
+
+class TextMeasureCache:
+    """LRU cache of string -> pixel width for one Tk font.
+
+    Call validate() before a batch of measurements; it drops the cache when the
+    font's actual settings or Tk's scaling (DPI) changed and returns True then.
+    """
+    def __init__(self, font: tkfont.Font, maxsize: int = 4096):
+        self.font = font
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._signature = None
+
+    def validate(self) -> bool:
+        sig = (tuple(sorted(self.font.actual().items())), str(self.font.tk.call("tk", "scaling")))
+        if sig == self._signature:
+            return False
+        self._cache.clear()
+        self._signature = sig
+        return True
+
+    def measure(self, text: str) -> int:
+        px = self._cache.get(text)
+        if px is not None:
+            self._cache.move_to_end(text)
+            return px
+        px = self.font.measure(text)
+        self._cache[text] = px
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return px
+
+def measure_columns(pkgs, col_keys: dict, measure) -> dict:
+    """Widest text (pixels, no padding) per column for a package list.
+
+    Only the AUTOFIT_CANDIDATES longest strings of each column are measured, so the
+    number of font round-trips stays flat however many packages were returned.
+    """
+    widths = {}
+    for col, key in col_keys.items():
+        values = {p.get(key, "") or "" for p in pkgs}
+        longest = heapq.nlargest(AUTOFIT_CANDIDATES, values, key=len)
+        widths[col] = max((measure(v) for v in longest), default=0)
+    return widths
+
+# ====================== UI state (rendered at ~30 Hz) ======================
+RENDER_INTERVAL_MS = 33
+
+class UiState:
+    """What the main window should show.
+
+    Worker threads mutate it freely; only WingetUpdaterUI._render_tick reads it,
+    applying just the fields that changed since the previous tick.
+    """
+    LOG_TAIL = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._pending_log = []
+        self.log_tail = deque(maxlen=self.LOG_TAIL)
+        self.phase = ""
+        self.total = 0
+        self.value = 0
+        self.status = "Idle"
+        self.counter = "0 apps found • 0 selected"
+        self.resources = ""
+
+    def start_progress(self, phase: str, total: int):
+        with self._lock:
+            self.phase = phase
+            self.total = max(0, int(total))
+            self.value = 0
+            self.status = f"{phase}: 0/{self.total}"
+            self._dirty.update(("progress", "status"))
+
+    def step_progress(self, inc: int = 1):
+        with self._lock:
+            if self.total <= 0:
+                return
+            self.value = min(self.total, self.value + inc)
+            self.status = f"{self.phase}: {self.value}/{self.total}"
+            self._dirty.update(("progress", "status"))
+
+    def finish_progress(self, canceled=False):
+        with self._lock:
+            if self.total > 0:
+                self.value = self.total
+                suffix = " (canceled)" if canceled else " (done)"
+                self.status = f"{self.phase}: {self.total}/{self.total}{suffix}"
+                self._dirty.add("progress")
+            else:
+                self.status = "Idle"
+            self._dirty.add("status")
+
+    def set_counter(self, text: str):
+        with self._lock:
+            if text != self.counter:
+                self.counter = text
+                self._dirty.add("counter")
+
+    def set_resources(self, text: str):
+        with self._lock:
+            if text != self.resources:
+                self.resources = text
+                self._dirty.add("resources")
+
+    def append_log(self, text: str):
+        with self._lock:
+            self._pending_log.append(text)
+            self.log_tail.append(text)
+            self._dirty.add("log")
+
+    def take_changes(self) -> dict:
+        """Return {field: value} for everything changed since the last call."""
+        with self._lock:
+            if not self._dirty:
+                return {}
+            changes = {}
+            if "progress" in self._dirty:
+                changes["progress"] = (max(self.total, 1), self.value)
+            if "status" in self._dirty:
+                changes["status"] = self.status
+            if "counter" in self._dirty:
+                changes["counter"] = self.counter
+            if "resources" in self._dirty:
+                changes["resources"] = self.resources
+            if "log" in self._dirty:
+                changes["log"] = self._pending_log
+                self._pending_log = []
+            self._dirty.clear()
+            return changes
+
 # ====================== UI Class ======================
 class WingetUpdaterUI:
-    def __init__(self, root):
+    def __init__(self, root, fleet: Optional[FleetCoordinator] = None,
+                 monitor: Optional[ResourceMonitor] = None):
         self.root = root
-        self.root.title(APP_NAME_VERSION)
+        self.fleet = fleet
+        self.monitor = monitor or ResourceMonitor()
+        self.monitor.on_sample = lambda m: self.ui.set_resources(m.describe())
+        self.root.title(APP_NAME_VERSION + (f" — fleet ({len(fleet.pools)} hosts)" if fleet else ""))
         self.root.geometry("1280x900")
         self.root.minsize(1180, 830)
 
         self.updating = False
         self.cancel_requested = False
-        self.current_proc = None
+        self.running_procs = {}   # pkg_id -> Popen of every upgrade in flight
         self.loading_win = None
         self.window_icon_path = set_app_icon(self.root)
+        self.ui = UiState()
 
         # checkbox images and state store
         self.img_unchecked, self.img_checked = make_checkbox_images(16)
@@ -382,6 +1702,10 @@ class WingetUpdaterUI:
         ttk.Button(top, text="Select All",  command=self.select_all).pack(side="left", padx=(10, 0))
         ttk.Button(top, text="Select None", command=self.select_none).pack(side="left", padx=(6, 0))
 
+        ttk.Button(top, text="Import List...",   command=self.import_list).pack(side="left", padx=(20, 0))
+        ttk.Button(top, text="Export List...",   command=self.export_list).pack(side="left", padx=(6, 0))
+        ttk.Button(top, text="Export Report...", command=self.export_report).pack(side="left", padx=(6, 0))
+
         self.btn_update = ttk.Button(top, text="Update Selected", command=self.update_selected_async)
         self.btn_update.pack(side="right")
 
@@ -393,11 +1717,20 @@ class WingetUpdaterUI:
         tree_wrap = ttk.Frame(self.root); tree_wrap.pack(fill="both", expand=True, padx=12, pady=(8, 8))
 
         cols = ("Name", "Id", "Current", "Available")
+        if self.fleet:
+            cols = ("Host",) + cols
         self.fixed_cols = cols
+        self.col_keys = {"Host": "host", "Name": "name", "Id": "id", "Current": "current", "Available": "available"}
+        self.col_keys = {c: self.col_keys[c] for c in cols}
+        self.packages = []     # last scan, as returned by get_winget_upgrades
+        self.content_px = {}   # widest cell text per column for self.packages
+        self.outcomes = []     # one record per finished upgrade (see OUTCOME_FIELDS)
         self.tree = ttk.Treeview(tree_wrap, columns=cols, show="tree headings", height=22, selectmode="none")
 
         # Headings
         self.tree.heading("#0",       text="Select",   anchor="center")
+        if self.fleet:
+            self.tree.heading("Host", text="Host",     anchor="w")
         self.tree.heading("Name",     text="Name",     anchor="w")
         self.tree.heading("Id",       text="Id",       anchor="w")
         self.tree.heading("Current",  text="Current",  anchor="center")
@@ -406,6 +1739,7 @@ class WingetUpdaterUI:
         # Column widths
         # --- Select column: fit header text, centered checkboxes, locked resize ---
         font = tkfont.nametofont("TkDefaultFont")
+        self.text_measure = TextMeasureCache(font)
         text_width = font.measure("Select") + 20  # padding so it doesn’t feel cramped
         self.tree.column("#0",
             width=text_width,
@@ -414,7 +1748,10 @@ class WingetUpdaterUI:
             stretch=False
         )
 
-        # Other columns start with sensible widths; users can resize them or double-click to auto-fit
+        # Other columns start with sensible widths and are auto-fitted when a scan loads;
+        # users can still resize them or double-click a separator to auto-fit
+        if self.fleet:
+            self.tree.column("Host",  width=160, minwidth=90,  anchor="w",      stretch=False)
         self.tree.column("Name",      width=520, minwidth=140, anchor="w",      stretch=False)
         self.tree.column("Id",        width=560, minwidth=200, anchor="w",      stretch=False)
         self.tree.column("Current",   width=110, minwidth=70,  anchor="center", stretch=False)
@@ -448,6 +1785,8 @@ class WingetUpdaterUI:
         self.pb_label = ttk.Label(pb_wrap, text="Idle"); self.pb_label.pack(side="left")
         self.pb = ttk.Progressbar(pb_wrap, orient="horizontal", mode="determinate")
         self.pb.pack(fill="x", expand=True, padx=10)
+        self.res_label = ttk.Label(self.root, text="", foreground="gray30")
+        self.res_label.pack(anchor="w", padx=12)
 
         # ===== Signature (before log) =====
         sig_frame = ttk.Frame(self.root); sig_frame.pack(fill="x", padx=12, pady=(4, 0))
@@ -492,6 +1831,19 @@ class WingetUpdaterUI:
         log_wrap.rowconfigure(0, weight=1)
         log_wrap.columnconfigure(0, weight=1)
 
+        # ===== Render tick + debug overlay (F12) =====
+        self.redraws = 0
+        self.lag_avg_ms = 0.0
+        self.lag_max_ms = 0.0
+        self._lag_window_max = 0.0
+        self._overlay = None
+        self._overlay_next = 0.0
+        self.root.bind("<F12>", self.toggle_debug_overlay)
+        if PROFILER is not None:
+            self.root.bind("<F11>", lambda _: self.save_diagnostics())
+        self._tick_due = time.perf_counter() + RENDER_INTERVAL_MS / 1000
+        self.root.after(RENDER_INTERVAL_MS, self._render_tick)
+
         self.root.after(0, self.center_on_screen)
 
     # ----- mouse handlers: block header reordering; lock select column resize; toggle on #0
@@ -547,23 +1899,30 @@ class WingetUpdaterUI:
             return  # don't auto-fit Select column
         self.autofit_column(col_left)
 
-    def autofit_column(self, col_id: str):
+    def autofit_column(self, col_id: str, max_width: Optional[int] = None):
         """Resize column to fit its widest content + padding (like Excel)."""
+        col = self.tree.column(col_id, "id")
+        if self.text_measure.validate():
+            self.measure_packages()
         heading = self.tree.heading(col_id, "text") or ""
-        font = tkfont.nametofont("TkDefaultFont")
-        pad = 24  # pixels
-
-        max_px = font.measure(heading)
-        for item in self.tree.get_children(""):
-            val = self.tree.set(item, col_id) or ""
-            px = font.measure(val)
-            if px > max_px:
-                max_px = px
-
+        max_px = max(self.text_measure.measure(heading), self.content_px.get(col, 0))
         minw = int(self.tree.column(col_id, "minwidth") or 20)
-        new_w = max(minw, max_px + pad)
+        new_w = max(minw, max_px + AUTOFIT_PAD)
+        if max_width:
+            new_w = min(new_w, max(minw, max_width))
         self.tree.column(col_id, width=new_w)
 
+    def measure_packages(self, added=None):
+        """Measure self.packages once per scan (or after a font/DPI change).
+
+        With `added`, only those rows are measured and merged into the current widths.
+        """
+        if self.text_measure.validate() or added is None:
+            self.content_px = measure_columns(self.packages, self.col_keys, self.text_measure.measure)
+            return
+        for col, px in measure_columns(added, self.col_keys, self.text_measure.measure).items():
+            self.content_px[col] = max(px, self.content_px.get(col, 0))
+
     # ----- window centering -----
     def center_on_screen(self):
         self.root.update_idletasks()
@@ -611,31 +1970,64 @@ class WingetUpdaterUI:
             self.loading_win.destroy()
             self.loading_win = None
 
-    # ====================== Progress helpers ======================
+    # ====================== Progress helpers (safe from any thread) ======================
     def progress_start(self, phase: str, total: int):
-        self.pb_phase = phase
-        self.pb_total = max(0, int(total))
-        self.pb_value = 0
-        self.pb.configure(maximum=max(self.pb_total, 1), value=0, mode="determinate")
-        self.pb_label.configure(text=f"{phase}: 0/{self.pb_total}")
-        self.root.update_idletasks()
+        self.ui.start_progress(phase, total)
 
     def progress_step(self, inc: int = 1):
-        if self.pb_total <= 0:
-            return
-        self.pb_value = min(self.pb_total, self.pb_value + inc)
-        self.pb.configure(value=self.pb_value)
-        self.pb_label.configure(text=f"{self.pb_phase}: {self.pb_value}/{self.pb_total}")
-        self.root.update_idletasks()
+        self.ui.step_progress(inc)
 
     def progress_finish(self, canceled=False):
-        if getattr(self, "pb_total", 0) > 0:
-            self.pb.configure(value=self.pb_total)
-            suffix = " (canceled)" if canceled else " (done)"
-            self.pb_label.configure(text=f"{self.pb_phase}: {self.pb_total}/{self.pb_total}{suffix}")
-        else:
-            self.pb_label.configure(text="Idle")
-        self.root.update_idletasks()
+        self.ui.finish_progress(canceled)
+
+    # ====================== Render tick ======================
+    def _render_tick(self):
+        now = time.perf_counter()
+        lag = max(0.0, (now - self._tick_due) * 1000)
+        if PROFILER is not None:
+            PROFILER.record_lag(lag)
+        self.lag_avg_ms = self.lag_avg_ms * 0.9 + lag * 0.1
+        self._lag_window_max = max(self._lag_window_max, lag)
+
+        changes = self.ui.take_changes()
+        if changes:
+            with profile_span("render", fields=",".join(changes)):
+                self._apply_ui_changes(changes)
+            self.redraws += 1
+
+        if self._overlay is not None and now >= self._overlay_next:
+            self.lag_max_ms, self._lag_window_max = self._lag_window_max, 0.0
+            self._overlay.configure(
+                text=f"redraws {self.redraws} • loop lag {self.lag_avg_ms:.1f} ms avg, {self.lag_max_ms:.1f} ms max"
+            )
+            self._overlay_next = now + 0.5
+
+        self._tick_due = time.perf_counter() + RENDER_INTERVAL_MS / 1000
+        self.root.after(RENDER_INTERVAL_MS, self._render_tick)
+
+    def _apply_ui_changes(self, changes: dict):
+        if "progress" in changes:
+            maximum, value = changes["progress"]
+            self.pb.configure(maximum=maximum, value=value, mode="determinate")
+        if "status" in changes:
+            self.pb_label.configure(text=changes["status"])
+        if "counter" in changes:
+            self.counter_var.set(changes["counter"])
+        if "resources" in changes:
+            self.res_label.configure(text=changes["resources"])
+        if changes.get("log"):
+            self.log_box.insert(tk.END, "\n".join(changes["log"]) + "\n")
+            self.log_box.see(tk.END)
+
+    def toggle_debug_overlay(self, _=None):
+        if self._overlay is not None:
+            self._overlay.destroy()
+            self._overlay = None
+            return
+        self._overlay = tk.Label(self.root, text="", background="#222", foreground="#9f9",
+                                 font=("Consolas", 9), padx=6, pady=2)
+        self._overlay.place(relx=1.0, y=0, anchor="ne")
+        self._overlay_next = 0.0
 
     # ====================== Selection helpers ======================
     def _iter_items(self):
@@ -654,12 +2046,13 @@ class WingetUpdaterUI:
         self.update_counter()
 
     def update_counter(self):
-        total = len(self.tree.get_children(""))
+        total = len(self.packages)   # one entry per tree row
         selected = len(self.checked_items)
-        self.counter_var.set(f"{total} apps found • {selected} selected")
+        self.ui.set_counter(f"{total} apps found • {selected} selected")
 
     def clear_tree(self):
         self.checked_items.clear()
+        self.packages = []
         for i in self._iter_items():
             self.tree.delete(i)
 
@@ -667,6 +2060,9 @@ class WingetUpdaterUI:
     def check_for_updates_async(self):
         include_unknown = bool(self.include_unknown_var.get())
         self.btn_check.config(state="disabled")
+        if self.fleet:
+            self.check_fleet_async(include_unknown)
+            return
         self.show_loading("Checking for updates...")
 
         def worker():
@@ -676,7 +2072,7 @@ class WingetUpdaterUI:
                 self.root.after(0, lambda: (
                     self.hide_loading(),
                     self.btn_check.config(state="normal"),
-                    self.counter_var.set("0 apps found • 0 selected"),
+                    self.ui.set_counter("0 apps found • 0 selected"),
                     messagebox.showerror("winget error", f"Failed to query updates:\n{e}"),
                     self.log(f"[winget] {e}")
                 ))
@@ -685,46 +2081,90 @@ class WingetUpdaterUI:
 
         threading.Thread(target=worker, daemon=True).start()
 
+    def check_fleet_async(self, include_unknown: bool):
+        """Scan every fleet host; rows stream into the tree as each host answers."""
+        self.clear_tree()
+        self.update_counter()
+        self.progress_start("Scanning hosts", len(self.fleet.pools))
+
+        def on_packages(host, items):
+            for it in items:
+                it["host"] = host
+            self.log(f"[{host}] {len(items)} update(s) available")
+            self.root.after(0, lambda: self.insert_packages(items))
+            self.progress_step(1)
+
+        def on_error(host, e):
+            self.log(f"[{host}] {e}")
+            self.progress_step(1)
+
+        def worker():
+            self.fleet.scan(include_unknown, on_packages, on_error)
+            self.root.after(0, lambda: (
+                self.btn_check.config(state="normal"),
+                self.progress_finish(),
+            ))
+
+        threading.Thread(target=worker, daemon=True).start()
+
     def populate_tree(self, pkgs):
         self.hide_loading()
         self.clear_tree()
         self.btn_check.config(state="normal")
         if not pkgs:
-            self.counter_var.set("0 apps found • 0 selected")
+            self.ui.set_counter("0 apps found • 0 selected")
             self.log("No apps need updating.")
             return
+        self.insert_packages(pkgs)
+
+    def insert_packages(self, pkgs, checked: bool = False, fit: bool = True):
+        """Append rows to the tree and, unless fit=False, re-fit the columns."""
+        with profile_span("populate_tree", rows=len(pkgs)):
+            self._insert_packages(pkgs, checked, fit)
 
+    def _insert_packages(self, pkgs, checked: bool, fit: bool):
         # Keep order as returned by winget (do NOT sort alphabetically)
         for p in pkgs:
             item = self.tree.insert(
                 "", "end",
                 text="",              # #0 has no text
-                image=self.img_unchecked,  # centered via anchor and fixed width
-                values=(p["name"], p["id"], p.get("current", ""), p.get("available", "")),
+                image=self.img_checked if checked else self.img_unchecked,  # centered via anchor and fixed width
+                values=tuple(p.get(key, "") for key in self.col_keys.values()),
             )
-            self.checked_items.discard(item)
+            if checked:
+                self.checked_items.add(item)
+            else:
+                self.checked_items.discard(item)
+        self.packages.extend(pkgs)
+        if fit:
+            self.measure_packages(added=pkgs)
+            self.fit_columns()
         self.update_counter()
 
+    def fit_columns(self):
+        for col in self.fixed_cols:
+            self.autofit_column(col, max_width=AUTOFIT_MAX_WIDTH)
+
     # ====================== Update selected (async + Cancel) ======================
     def update_selected_async(self):
         if getattr(self, "updating", False):
             self.cancel_requested = True
             self.btn_update.config(text="Cancelling...", state="disabled")
-            proc = self.current_proc
-            if proc and proc.poll() is None:
-                try:
-                    proc.terminate()
-                except Exception:
-                    pass
+            if self.fleet:
+                self.fleet.cancel()
+            for proc in list(self.running_procs.values()):
+                kill_process_tree(proc)
             return
 
         # Gather selection from our state set
         targets = []
         for item in list(self.checked_items):
+            host    = self.tree.set(item, "Host") if self.fleet else ""
             pkg_id  = self.tree.set(item, "Id")
             current = (self.tree.set(item, "Current") or "").strip()
             if pkg_id:
-                targets.append((pkg_id, current))
+                include_unknown = self.include_unknown_var.get() or (not current) or (current.lower() == "unknown")
+                targets.append((host, pkg_id, include_unknown))
 
         if not targets:
             messagebox.showinfo("No Selection", "No apps selected for update.")
@@ -732,81 +2172,338 @@ class WingetUpdaterUI:
 
         self.updating = True
         self.cancel_requested = False
-        self.current_proc = None
+        self.running_procs.clear()
         self.btn_check.config(state="disabled")
         self.btn_update.config(text="Cancel", state="normal")
         self.log(f"Starting updates for {len(targets)} package(s)...")
 
         self.progress_start("Updating", len(targets))
 
+        elevate, reboot, failed = [], [], []
+        monitor = self.monitor
+
+        def run_one(pkg_id, include_unknown):
+            self.log(f"Updating {pkg_id} ...")
+            code, attempts = None, 1
+
+            def on_start(proc):
+                self.running_procs[pkg_id] = proc
+                monitor.track(pkg_id, proc.pid)
+
+            try:
+                with profile_span("upgrade", id=pkg_id):
+                    outcome, code, attempts = upgrade_with_retry(
+                        pkg_id, include_unknown,
+                        on_line=self.log,
+                        should_cancel=lambda: self.cancel_requested,
+                        on_start=on_start,
+                    )
+            except Exception as ex:
+                outcome = OUTCOME_FATAL
+                self.log(f"Error: {ex}")
+            finally:
+                self.running_procs.pop(pkg_id, None)
+            peak = monitor.untrack(pkg_id)
+            if outcome == OUTCOME_ELEVATE and not is_admin():
+                # Recorded once the elevated batch has run (see worker)
+                elevate.append((pkg_id, include_unknown, attempts, peak))
+            else:
+                self.tally_outcome(pkg_id, outcome, code, attempts, peak, reboot, failed)
+            self.log(describe_outcome(pkg_id, outcome, code, attempts))
+            if peak and peak["rss"]:
+                self.log(f"   peak CPU {peak['cpu']:.0f}% • RSS {_fmt_bytes(peak['rss'])} • I/O {_fmt_bytes(peak['io'])}/s")
+            self.progress_step(1)
+
         def worker():
-            for pkg_id, current in targets:
+            # Admit upgrades one at a time while the system has headroom (see ResourceMonitor.can_start)
+            queue = deque((pkg_id, include_unknown) for _, pkg_id, include_unknown in targets)
+            running = {}
+            monitor.start()
+            while queue or running:
+                for pkg_id in [p for p, t in running.items() if not t.is_alive()]:
+                    del running[pkg_id]
                 if self.cancel_requested:
-                    break
-                self.root.after(0, lambda pid=pkg_id: self.log(f"Updating {pid} ..."))
+                    if not running:
+                        break
+                elif queue:
+                    target = monitor.pick_next(queue, running)
+                    if target:
+                        t = threading.Thread(target=run_one, args=target, daemon=True)
+                        running[target[0]] = t
+                        t.start()
+                        continue
+                time.sleep(0.2)
+            monitor.stop()
+            monitor.save_history()
+            self.ui.set_resources("")
+
+            # One UAC prompt for everything that needs admin rights
+            codes = [None] * len(elevate)
+            if elevate and not self.cancel_requested:
+                ids = ", ".join(e[0] for e in elevate)
+                self.log(f"Requesting administrator rights for: {ids}")
                 try:
-                    cmd = [
-                        "winget", "upgrade", "--id", pkg_id,
-                        "--accept-package-agreements", "--accept-source-agreements",
-                        "--disable-interactivity", "-h"
-                    ]
-                    if self.include_unknown_var.get() or (not current) or (current.lower() == "unknown"):
-                        cmd.insert(2, "--include-unknown")
-
-                    self.current_proc = subprocess.Popen(
-                        cmd,
-                        shell=False, text=True,
-                        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                        startupinfo=_hidden_startupinfo(),
-                        creationflags=CREATE_NO_WINDOW
-                    )
-                    spinner_re = re.compile(r"^[\s\\/\|\-\r]+$")
-                    while True:
-                        if self.cancel_requested and self.current_proc and self.current_proc.poll() is None:
-                            try:
-                                self.current_proc.terminate()
-                            except Exception:
-                                pass
-                        line = self.current_proc.stdout.readline()
-                        if not line:
-                            break
-                        ln = line.rstrip()
-                        if ln and not spinner_re.match(ln):
-                            self.root.after(0, lambda s=ln: self.log(s))
-                    _, err = self.current_proc.communicate()
-                    if err:
-                        self.root.after(0, lambda e=err: self.log(e.strip()))
+                    codes = run_elevated_batch([build_upgrade_cmd(pid, inc) for pid, inc, _, _ in elevate])
                 except Exception as ex:
-                    self.root.after(0, lambda ex=ex: self.log(f"Error: {ex}"))
+                    self.log(f"Error: {ex}")
+            for (pkg_id, _, attempts, peak), code in zip(elevate, codes):
+                if code is None:
+                    outcome = OUTCOME_CANCELLED if self.cancel_requested else OUTCOME_ELEVATE
+                    self.log(f"✖ {pkg_id}: the elevated upgrade did not run (prompt declined?)")
+                else:
+                    outcome = classify_winget_exit(code)[0]
+                    attempts += 1
+                    self.log(describe_outcome(pkg_id, outcome, code, attempts) + " (elevated)")
+                self.tally_outcome(pkg_id, outcome, code, attempts, peak, reboot, failed)
+            if reboot:
+                self.log(f"Restart Windows to finish: {', '.join(reboot)}")
+            self.root.after(0, lambda: self.finish_updates(failed))
+
+        def fleet_worker():
+            # Agents retry on their own; elevation has to be granted on the agent host
+            failed, reboot = [], []
+
+            def on_result(host, pkg_id, outcome, code, attempts, peak):
+                if outcome == OUTCOME_REBOOT:
+                    reboot.append(f"{host}/{pkg_id}")
+                elif outcome not in (OUTCOME_SUCCESS, OUTCOME_CANCELLED):
+                    failed.append(f"{host}/{pkg_id}")
+                self.record_outcome(host, pkg_id, outcome, code, attempts, peak)
+                self.log(f"[{host}] {describe_outcome(pkg_id, outcome, code, attempts)}")
+                if peak and peak.get("rss"):
+                    self.log(f"[{host}]    peak CPU {peak['cpu']:.0f}% • RSS {_fmt_bytes(peak['rss'])} • I/O {_fmt_bytes(peak['io'])}/s")
+                self.progress_step(1)
+
+            self.fleet.upgrade(targets, lambda host, line: self.log(f"[{host}] {line}"), on_result)
+            if reboot:
+                self.log(f"Restart required to finish: {', '.join(reboot)}")
+            self.root.after(0, lambda: self.finish_updates(failed))
+
+        threading.Thread(target=fleet_worker if self.fleet else worker, daemon=True).start()
+
+    def tally_outcome(self, pkg_id, outcome, code, attempts, peak, reboot, failed):
+        """Record a package's final result and add it to the reboot/failed summaries."""
+        if outcome == OUTCOME_REBOOT:
+            reboot.append(pkg_id)
+        elif outcome not in (OUTCOME_SUCCESS, OUTCOME_CANCELLED):
+            failed.append(pkg_id)
+        self.record_outcome("", pkg_id, outcome, code, attempts, peak)
+
+    def record_outcome(self, host, pkg_id, outcome, code, attempts, peak: Optional[dict] = None):
+        peak = peak or {}
+        self.outcomes.append({
+            "host": host, "id": pkg_id, "outcome": outcome,
+            "code": "" if code is None else f"0x{code & 0xFFFFFFFF:08X}",
+            "attempts": attempts,
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "peak_cpu_percent": round(peak.get("cpu", 0.0), 1) if peak else "",
+            "peak_rss_bytes": peak.get("rss", ""),
+            "peak_io_bytes_per_s": round(peak.get("io", 0.0)) if peak else "",
+        })
+
+    def finish_updates(self, failed):
+        canceled = self.cancel_requested
+        if canceled:
+            self.log("Cancelled.")
+        elif failed:
+            self.log(f"Updates completed with {len(failed)} failure(s): {', '.join(failed)}")
+        else:
+            self.log("All selected updates completed.")
+            play_success_sound()
+        self.updating = False
+        self.cancel_requested = False
+        self.running_procs.clear()
+        self.btn_check.config(state="normal")
+        self.btn_update.config(text="Update Selected", state="normal")
+        self.progress_finish(canceled=canceled)
+
+    # ====================== Export / import ======================
+    IMPORT_BATCH = 500
+
+    def _ask_export_path(self, title: str, initialfile: str) -> str:
+        return filedialog.asksaveasfilename(
+            parent=self.root, title=title, initialfile=initialfile,
+            defaultextension=".csv", filetypes=EXPORT_FILETYPES,
+        )
+
+    def _export_async(self, path: str, fields, records, what: str):
+        def worker():
+            try:
+                n = export_records(path, fields, records)
+                self.log(f"Exported {n} {what} to {path}")
+            except Exception as e:
+                self.log(f"Export failed: {e}")
+                self.root.after(0, lambda e=e: messagebox.showerror("Export failed", str(e)))
+        threading.Thread(target=worker, daemon=True).start()
+
+    def export_list(self):
+        if not self.packages:
+            messagebox.showinfo("Nothing to export", "Check for updates or import a list first.")
+            return
+        path = self._ask_export_path("Export package list", "packages.csv")
+        if path:
+            self._export_async(path, PACKAGE_FIELDS, list(self.packages), "package(s)")
+
+    def export_report(self):
+        if not self.outcomes:
+            messagebox.showinfo("Nothing to export", "No upgrades have run yet.")
+            return
+        path = self._ask_export_path("Export upgrade report", "upgrade-report.csv")
+        if path:
+            self._export_async(path, OUTCOME_FIELDS, list(self.outcomes), "upgrade result(s)")
+
+    def import_list(self):
+        """Load a prepared package list (e.g. from a golden machine) and select it for updating.
+
+        Only parsing streams: the loaded rows are still held in the tree and in
+        self.packages (used for export and column fitting).
+        """
+        if self.updating:
+            return
+        path = filedialog.askopenfilename(
+            parent=self.root, title="Import package list",
+            filetypes=[("Package lists", "*.csv *.jsonl *.wau")] + EXPORT_FILETYPES,
+        )
+        if not path:
+            return
+        self.clear_tree()
+        self.update_counter()
+        self.btn_check.config(state="disabled")
+        self.log(f"Importing {path} ...")
+
+        def insert_and_wait(batch):
+            # Hand one batch to the UI thread and wait, so the reader never runs ahead
+            inserted = threading.Event()
+            error = []
+
+            def insert():
+                try:
+                    self.insert_packages(batch, checked=True, fit=False)
+                except Exception as e:
+                    error.append(e)
                 finally:
-                    self.root.after(0, lambda pid=pkg_id: self.log(f"✔ Finished {pid}"))
-                    self.root.after(0, lambda: self.progress_step(1))
+                    inserted.set()
 
-            def done():
-                canceled = self.cancel_requested
-                if canceled:
-                    self.log("Cancelled.")
-                else:
-                    self.log("All selected updates completed.")
-                    play_success_sound()
-                self.updating = False
-                self.cancel_requested = False
-                self.current_proc = None
-                self.btn_check.config(state="normal")
-                self.btn_update.config(text="Update Selected", state="normal")
-                self.progress_finish(canceled=canceled)
-            self.root.after(0, done)
+            self.root.after(0, insert)
+            inserted.wait()
+            if error:
+                raise error[0]
+
+        def finish():
+            # Measure and fit once for the whole import instead of per batch
+            self.measure_packages()
+            self.fit_columns()
+            self.btn_check.config(state="normal")
+
+        def worker():
+            total = 0
+            try:
+                batch = []
+                for row in iter_package_rows(path):
+                    batch.append(row)
+                    if len(batch) >= self.IMPORT_BATCH:
+                        insert_and_wait(batch)
+                        total += len(batch)
+                        batch = []
+                if batch:
+                    insert_and_wait(batch)
+                    total += len(batch)
+                self.log(f"Imported {total} package(s); they are selected — click Update Selected to upgrade.")
+            except Exception as e:
+                self.log(f"Import failed after {total} row(s): {e}")
+            self.root.after(0, finish)
 
         threading.Thread(target=worker, daemon=True).start()
 
-    # ====================== Logging ======================
+    # ====================== Diagnostics (--profile) ======================
+    def save_diagnostics(self, path: Optional[str] = None) -> Optional[str]:
+        if PROFILER is None:
+            return None
+        try:
+            path = PROFILER.write_bundle(path, log_tail=list(self.ui.log_tail), extra={
+                "redraws": self.redraws,
+                "loop_lag_avg_ms": round(self.lag_avg_ms, 2),
+                "packages": len(self.packages),
+                "fleet_hosts": list(self.fleet.pools) if self.fleet else [],
+            })
+            self.log(f"Diagnostics saved to {path}")
+            return path
+        except Exception as e:
+            self.log(f"Saving diagnostics failed: {e}")
+            return None
+
+    # ====================== Logging (safe from any thread) ======================
     def log(self, text: str):
-        self.log_box.insert(tk.END, text + "\n")
-        self.log_box.see(tk.END)
-        self.root.update_idletasks()
+        self.ui.append_log(text)
 
 # ====================== main ======================
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description=APP_NAME_VERSION)
+    ap.add_argument("--agent", action="store_true",
+                    help="run headless as a fleet agent instead of opening the window")
+    ap.add_argument("--listen", default=f"127.0.0.1:{FLEET_DEFAULT_PORT}", metavar="HOST:PORT",
+                    help="address the agent listens on (default: %(default)s)")
+    ap.add_argument("--fleet", metavar="HOST[:PORT],...",
+                    help="drive scans and upgrades on these agents instead of this PC")
+    ap.add_argument("--per-host", type=int, default=FLEET_PER_HOST_LIMIT, metavar="N",
+                    help="concurrent requests per agent (default: %(default)s)")
+    ap.add_argument("--token", default=os.environ.get("APP_UPDATER_TOKEN"),
+                    help="shared secret between coordinator and agents (or set APP_UPDATER_TOKEN)")
+    ap.add_argument("--max-parallel", type=int, default=MAX_CONCURRENT_UPGRADES, metavar="N",
+                    help="upgrades allowed to run at the same time, here or on an agent (default: %(default)s)")
+    ap.add_argument("--cpu-limit", type=float, default=ADMIT_CPU_PERCENT, metavar="PCT",
+                    help="start another upgrade only below this system CPU %% (default: %(default)s)")
+    ap.add_argument("--mem-limit", type=float, default=ADMIT_MEM_PERCENT, metavar="PCT",
+                    help="start another upgrade only below this memory use %% (default: %(default)s)")
+    ap.add_argument("--profile", nargs="?", const="spans", metavar="cprofile,tracemalloc",
+                    help="record timings and winget outputs into a diagnostics zip on exit (F11 saves one now); "
+                         "optionally also capture cProfile and/or tracemalloc")
+    ap.add_argument("--profile-out", metavar="ZIP",
+                    help="where to write the diagnostics zip (default: under %%LOCALAPPDATA%%\\WindowsAppUpdater)")
+    ap.add_argument("--replay-diagnostics", metavar="ZIP",
+                    help="re-run the parsers over the winget outputs in a diagnostics zip and print timings")
+    return ap.parse_args(argv)
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.replay_diagnostics:
+        report, results, failures = replay_diagnostics(args.replay_diagnostics)
+        if sys.stdout is None:
+            # Windowed EXE: no console to print to
+            root = tk.Tk()
+            root.withdraw()
+            show = messagebox.showerror if failures else messagebox.showinfo
+            show(APP_NAME_VERSION, f"{len(results)} output(s) replayed, {failures} parse failure(s).\n\n"
+                                   f"Report: {report}")
+            root.destroy()
+        sys.exit(1 if failures else 0)
+    if args.profile:
+        modes = {m.strip().lower() for m in args.profile.split(",")}
+        PROFILER = Profiler(cprofile="cprofile" in modes, trace_malloc="tracemalloc" in modes)
+    if args.agent:
+        if sys.stdout is None:
+            # Windowed EXE: there is no console, so keep the agent's output in a log file
+            log_path = os.path.join(app_data_dir(), "agent.log")
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            sys.stdout = sys.stderr = open(log_path, "a", encoding="utf-8", buffering=1)
+        try:
+            run_fleet_agent(args.listen, args.token,
+                            ResourceMonitor(args.max_parallel, args.cpu_limit, args.mem_limit))
+        finally:
+            if PROFILER is not None:
+                print(f"Diagnostics saved to {PROFILER.write_bundle(args.profile_out)}", flush=True)
+        sys.exit(0)
+    fleet = None
+    if args.fleet:
+        hosts = [h for h in args.fleet.split(",") if h.strip()]
+        fleet = FleetCoordinator(hosts, args.token, args.per_host)
+    if Image is None:
+        sys.exit("Pillow is required for the window: pip install pillow")
+    monitor = ResourceMonitor(args.max_parallel, args.cpu_limit, args.mem_limit)
     root = tk.Tk()
-    app = WingetUpdaterUI(root)
+    app = WingetUpdaterUI(root, fleet=fleet, monitor=monitor)
     root.mainloop()
+    if fleet:
+        fleet.close()
+    if PROFILER is not None:
+        app.save_diagnostics(args.profile_out)
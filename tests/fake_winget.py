@@ -0,0 +1,65 @@
+"""Stand-in for winget used by the fleet tests (installed on PATH as `winget`).
+
+  winget --version                 -> prints a version
+  winget upgrade --output json ... -> two packages: Vendor.Foo and Vendor.Fail
+  winget upgrade --id <id>         -> appends <id> to $FAKE_WINGET_STATE/starts.log, then:
+  winget upgrade --id Vendor.Foo   -> succeeds
+  winget upgrade --id Vendor.Fail  -> exits non-zero
+  winget upgrade --id Vendor.Busy* -> logs start/end times to $FAKE_WINGET_STATE/busy.log
+                                      around a one second "install"
+  winget upgrade --id Vendor.Slow  -> spawns a child "installer", writes both pids
+                                      to $FAKE_WINGET_STATE/slow.pids and hangs
+                                      without printing anything
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+PACKAGES = [
+    {"PackageName": "Foo App", "PackageIdentifier": "Vendor.Foo", "Version": "1.0", "AvailableVersion": "2.0"},
+    {"PackageName": "Fail App", "PackageIdentifier": "Vendor.Fail", "Version": "1.0", "AvailableVersion": "2.0"},
+]
+
+
+def main(args):
+    if args == ["--version"]:
+        print("v1.9.0")
+        return 0
+    if args[:1] != ["upgrade"]:
+        return 1
+    if "--id" not in args:
+        print(json.dumps({"Sources": [{"Packages": PACKAGES}]}))
+        return 0
+
+    pkg_id = args[args.index("--id") + 1]
+    with open(os.path.join(os.environ["FAKE_WINGET_STATE"], "starts.log"), "a") as f:
+        f.write(pkg_id + "\n")
+    if pkg_id == "Vendor.Slow":
+        child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(120)"])
+        state = os.environ["FAKE_WINGET_STATE"]
+        with open(os.path.join(state, "slow.pids.tmp"), "w") as f:
+            f.write(f"{os.getpid()} {child.pid}\n")
+        os.replace(os.path.join(state, "slow.pids.tmp"), os.path.join(state, "slow.pids"))
+        time.sleep(120)
+        return 0
+    print(f"Found {pkg_id}", flush=True)
+    if pkg_id.startswith("Vendor.Busy"):
+        log = os.path.join(os.environ["FAKE_WINGET_STATE"], "busy.log")
+        with open(log, "a") as f:
+            f.write(f"start {time.time()}\n")
+        time.sleep(1)
+        with open(log, "a") as f:
+            f.write(f"end {time.time()}\n")
+        print("Successfully installed", flush=True)
+        return 0
+    if pkg_id == "Vendor.Fail":
+        print("Installer failed", flush=True)
+        return 1
+    print("Successfully installed", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,109 @@
+"""Export/import round trips (CSV, JSON Lines, .wau) and atomic_writer, without Tk."""
+import importlib.util
+import json
+import os
+import stat
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(os.path.dirname(HERE), "App-Updater.py")
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("app_updater", APP)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+app = load_app()
+
+PACKAGES = [
+    {"host": "", "name": "Foo App", "id": "Vendor.Foo", "current": "1.0", "available": "2.0"},
+    {"host": "pc-2:8765", "name": "Bär, \"quoted\"\nApp", "id": "Vendor.Bar", "current": "Unknown", "available": "3.1"},
+    {"host": "", "name": "x" * 300, "id": "Vendor.Long", "current": "", "available": "1"},
+]
+
+
+@pytest.mark.parametrize("ext", [".csv", ".jsonl", ".wau"])
+def test_round_trip(tmp_path, ext):
+    path = str(tmp_path / f"packages{ext}")
+    assert app.export_records(path, app.PACKAGE_FIELDS, iter(PACKAGES)) == len(PACKAGES)
+    assert list(app.iter_records(path)) == PACKAGES
+    assert list(app.iter_package_rows(path)) == PACKAGES
+    assert os.listdir(tmp_path) == [f"packages{ext}"]
+
+
+def test_unsupported_extension(tmp_path):
+    with pytest.raises(ValueError):
+        app.export_records(str(tmp_path / "packages.txt"), app.PACKAGE_FIELDS, PACKAGES)
+
+
+def test_truncated_wau_is_an_error(tmp_path):
+    path = tmp_path / "packages.wau"
+    app.export_records(str(path), app.PACKAGE_FIELDS, PACKAGES)
+    data = path.read_bytes()
+    path.write_bytes(data[:-5])
+    with pytest.raises(ValueError, match="Truncated"):
+        list(app.iter_records(str(path)))
+    path.write_bytes(b"NOPE" + data[4:])
+    with pytest.raises(ValueError):
+        list(app.iter_records(str(path)))
+
+
+def test_import_normalises_rows(tmp_path):
+    # Hand-written files: other key spellings, missing columns and rows without an id
+    csv_path = tmp_path / "list.csv"
+    csv_path.write_text("\ufeffId,name\n  Vendor.Foo  ,\n,Nameless\n", encoding="utf-8")
+    jsonl_path = tmp_path / "list.jsonl"
+    jsonl_path.write_text(json.dumps({"id": "Vendor.Bar", "current": None}) + "\n\n", encoding="utf-8")
+
+    assert list(app.iter_package_rows(str(csv_path))) == [
+        {"host": "", "name": "Vendor.Foo", "id": "Vendor.Foo", "current": "", "available": ""}]
+    assert list(app.iter_package_rows(str(jsonl_path))) == [
+        {"host": "", "name": "Vendor.Bar", "id": "Vendor.Bar", "current": "", "available": ""}]
+
+
+@pytest.mark.parametrize("ext", [".csv", ".jsonl", ".wau"])
+def test_failed_export_leaves_no_files(tmp_path, ext):
+    def records():
+        yield PACKAGES[0]
+        raise RuntimeError("disk on fire")
+
+    path = tmp_path / f"packages{ext}"
+    with pytest.raises(RuntimeError):
+        app.export_records(str(path), app.PACKAGE_FIELDS, records())
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_export_keeps_the_previous_file(tmp_path):
+    path = tmp_path / "packages.jsonl"
+    app.export_records(str(path), app.PACKAGE_FIELDS, PACKAGES)
+    before = path.read_bytes()
+    with pytest.raises(RuntimeError):
+        with app.atomic_writer(str(path)) as f:
+            f.write("partial")
+            raise RuntimeError("interrupted")
+    assert path.read_bytes() == before
+    assert os.listdir(tmp_path) == ["packages.jsonl"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+def test_atomic_writer_keeps_permissions(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        new = tmp_path / "new.csv"
+        with app.atomic_writer(str(new)) as f:
+            f.write("a")
+        assert stat.S_IMODE(new.stat().st_mode) == 0o644
+
+        existing = tmp_path / "existing.csv"
+        existing.write_text("old")
+        existing.chmod(0o640)
+        with app.atomic_writer(str(existing)) as f:
+            f.write("new")
+        assert existing.read_text() == "new"
+        assert stat.S_IMODE(existing.stat().st_mode) == 0o640
+    finally:
+        os.umask(umask)
@@ -0,0 +1,195 @@
+"""Fleet round trip on one box: several local agent processes driven by a coordinator,
+with tests/fake_winget.py standing in for winget."""
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="uses a POSIX winget shim and /proc")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(os.path.dirname(HERE), "App-Updater.py")
+TOKEN = "s3cret"
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("app_updater", APP)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+app = load_app()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            state = f.read().rsplit(")", 1)[1].split()[0]
+        return state not in ("Z", "X")
+    except OSError:
+        return False
+
+
+@pytest.fixture
+def fake_winget(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    shim = bin_dir / "winget"
+    shim.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(HERE, "fake_winget.py")}" "$@"\n')
+    shim.chmod(0o755)
+    state = tmp_path / "state"
+    state.mkdir()
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_WINGET_STATE", str(state))
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path / "appdata"))
+    return state
+
+
+@pytest.fixture
+def agents(fake_winget):
+    procs, hosts = [], []
+    for _ in range(2):
+        port = free_port()
+        procs.append(subprocess.Popen(
+            [sys.executable, APP, "--agent", "--listen", f"127.0.0.1:{port}", "--token", TOKEN],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+        hosts.append(f"127.0.0.1:{port}")
+    deadline = time.monotonic() + 15
+    for host in hosts:
+        while True:
+            try:
+                socket.create_connection(app.parse_host_port(host), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    pytest.fail(f"agent {host} did not start")
+                time.sleep(0.1)
+    yield hosts
+    for p in procs:
+        p.terminate()
+        p.wait(timeout=10)
+
+
+def scan(coord):
+    found, errors = {}, {}
+    coord.scan(False, lambda h, items: found.__setitem__(h, items), lambda h, e: errors.__setitem__(h, str(e)))
+    return found, errors
+
+
+def test_scan_and_upgrade_round_trip(agents):
+    coord = app.FleetCoordinator(agents, TOKEN)
+    try:
+        found, errors = scan(coord)
+        assert errors == {}
+        assert sorted(found) == sorted(agents)
+        for items in found.values():
+            assert [p["id"] for p in items] == ["Vendor.Foo", "Vendor.Fail"]
+
+        results, lines = [], []
+        targets = [(h, p["id"], False) for h, items in found.items() for p in items]
+        coord.upgrade(targets, lambda h, ln: lines.append((h, ln)), lambda *r: results.append(r))
+        outcomes = {(h, pid): outcome for h, pid, outcome, _, _, _ in results}
+        assert all(isinstance(peak, dict) for *_, peak in results)
+        for h in agents:
+            assert outcomes[(h, "Vendor.Foo")] == app.OUTCOME_SUCCESS
+            assert outcomes[(h, "Vendor.Fail")] == app.OUTCOME_FATAL
+            assert (h, "Successfully installed") in lines
+    finally:
+        coord.close()
+
+
+def test_agent_admits_one_upgrade_at_a_time_by_default(agents, fake_winget):
+    # The coordinator may send two requests at once (per_host_limit=2); the agent's
+    # ResourceMonitor (--max-parallel 1 by default) still runs them one after the other
+    coord = app.FleetCoordinator(agents[:1], TOKEN, per_host_limit=2)
+    results = []
+    try:
+        coord.upgrade([(agents[0], "Vendor.Busy1", False), (agents[0], "Vendor.Busy2", False)],
+                      lambda h, ln: None, lambda *r: results.append(r))
+    finally:
+        coord.close()
+    assert [r[2] for r in results] == [app.OUTCOME_SUCCESS] * 2
+    events = [ln.split() for ln in (fake_winget / "busy.log").read_text().splitlines()]
+    assert [kind for kind, _ in sorted(events, key=lambda e: float(e[1]))] == ["start", "end", "start", "end"]
+
+
+def test_wrong_token_is_rejected(agents):
+    coord = app.FleetCoordinator(agents, "wrong")
+    try:
+        found, errors = scan(coord)
+        assert found == {}
+        assert set(errors) == set(agents)
+        assert all("unauthorized" in e for e in errors.values())
+    finally:
+        coord.close()
+
+
+def test_cancel_kills_the_installer_tree(agents, fake_winget):
+    coord = app.FleetCoordinator(agents[:1], TOKEN)
+    results = []
+    worker = threading.Thread(target=coord.upgrade, args=(
+        [(agents[0], "Vendor.Slow", False)], lambda h, ln: None, lambda *r: results.append(r)))
+    worker.start()
+    try:
+        pids_file = fake_winget / "slow.pids"
+        deadline = time.monotonic() + 15
+        while not pids_file.exists():
+            assert time.monotonic() < deadline, "fake installer never started"
+            time.sleep(0.1)
+        pids = [int(p) for p in pids_file.read_text().split()]
+        assert all(alive(p) for p in pids)
+
+        coord.cancel()
+        worker.join(timeout=10)
+        assert results and results[0][2] == app.OUTCOME_CANCELLED
+
+        deadline = time.monotonic() + 10
+        while any(alive(p) for p in pids) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert not any(alive(p) for p in pids), "winget or its child installer survived cancel"
+    finally:
+        coord.close()
+
+
+def test_cancel_on_a_pooled_connection_does_not_resend_the_upgrade(agents, fake_winget):
+    # The scan leaves an idle connection behind, so the upgrade reuses it; cancelling
+    # must not look like a stale connection and start the upgrade a second time
+    coord = app.FleetCoordinator(agents[:1], TOKEN)
+    results = []
+    try:
+        found, errors = scan(coord)
+        assert errors == {}
+        worker = threading.Thread(target=coord.upgrade, args=(
+            [(agents[0], "Vendor.Slow", False)], lambda h, ln: None, lambda *r: results.append(r)))
+        worker.start()
+        deadline = time.monotonic() + 15
+        while not (fake_winget / "slow.pids").exists():
+            assert time.monotonic() < deadline, "fake installer never started"
+            time.sleep(0.1)
+
+        coord.cancel()
+        worker.join(timeout=10)
+        assert not worker.is_alive()
+        assert [r[2] for r in results] == [app.OUTCOME_CANCELLED]
+        time.sleep(2)  # the agent would be admitting a resent request by now
+        assert (fake_winget / "starts.log").read_text().split() == ["Vendor.Slow"]
+    finally:
+        coord.close()
+
+
+def test_agent_refuses_network_address_without_token():
+    with pytest.raises(SystemExit):
+        app.run_fleet_agent("0.0.0.0:0", None)
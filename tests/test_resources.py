@@ -0,0 +1,98 @@
+"""ResourceMonitor peaks, history and admission, without Tk or real installers."""
+import importlib.util
+import os
+from collections import deque
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(os.path.dirname(HERE), "App-Updater.py")
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("app_updater", APP)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+app = load_app()
+HEAVY = {"cpu": 10.0, "rss": app.HEAVY_RSS_BYTES, "io": 0.0}
+LIGHT = {"cpu": 10.0, "rss": 1024, "io": 0.0}
+
+
+@pytest.fixture
+def monitor(tmp_path):
+    return app.ResourceMonitor(history_path=str(tmp_path / "resource_history.json"))
+
+
+def run_once(monitor, pkg_id, usage):
+    """One tracked upgrade whose process tree peaked at `usage`."""
+    monitor.track(pkg_id, os.getpid())
+    monitor.peaks[pkg_id] = dict(usage)
+    return monitor.untrack(pkg_id)
+
+
+def test_peaks_are_per_run(monitor):
+    assert run_once(monitor, "Vendor.Foo", HEAVY) == HEAVY
+    assert monitor.is_heavy("Vendor.Foo")
+    # A later, lighter run reports its own peak and replaces the history entry
+    assert run_once(monitor, "Vendor.Foo", LIGHT) == LIGHT
+    assert not monitor.is_heavy("Vendor.Foo")
+    assert monitor.peaks == {}
+
+
+def test_retries_share_one_peak(monitor):
+    monitor.track("Vendor.Foo", 1)
+    monitor.peaks["Vendor.Foo"]["rss"] = 4096
+    monitor.track("Vendor.Foo", 2)  # next attempt
+    assert monitor.untrack("Vendor.Foo")["rss"] == 4096
+
+
+def test_history_round_trip(monitor):
+    run_once(monitor, "Vendor.Heavy", HEAVY)
+    monitor.save_history()
+    reloaded = app.ResourceMonitor(history_path=monitor.history_path)
+    assert reloaded.is_heavy("Vendor.Heavy")
+
+
+@pytest.fixture
+def admission(monitor, monkeypatch):
+    """A monitor allowing 3 parallel upgrades, with a controllable clock and system load."""
+    clock = [1000.0]
+    monkeypatch.setattr(app.time, "monotonic", lambda: clock[0])
+    monitor.max_parallel = 3
+    monitor.system = (10.0, 10.0)
+    run_once(monitor, "Vendor.Heavy1", HEAVY)
+    run_once(monitor, "Vendor.Heavy2", HEAVY)
+    return monitor, clock
+
+
+def test_starts_are_spaced(admission):
+    monitor, clock = admission
+    assert monitor.try_start("A", [])
+    assert not monitor.can_start("B", ["A"])
+    clock[0] += 2 * app.RESOURCE_SAMPLE_INTERVAL
+    assert monitor.try_start("B", ["A"])
+    assert not monitor.can_start("C", ["A", "B"])
+    assert monitor.can_start("C", [])  # nothing running: no need to wait
+
+
+def test_limits_apply(admission):
+    monitor, clock = admission
+    clock[0] += 10
+    assert not monitor.can_start("D", ["A", "B", "C"])
+    monitor.system = (95.0, 10.0)
+    assert not monitor.can_start("B", ["A"])
+
+
+def test_heavy_installers_are_kept_apart(admission):
+    monitor, clock = admission
+    clock[0] += 10
+    assert not monitor.can_start("Vendor.Heavy2", ["Vendor.Heavy1"])
+    queue = deque([("Vendor.Heavy2", False), ("Vendor.Light", True)])
+    assert monitor.pick_next(queue, ["Vendor.Heavy1"]) == ("Vendor.Light", True)
+    assert list(queue) == [("Vendor.Heavy2", False)]
+    assert monitor.pick_next(queue, []) == ("Vendor.Heavy2", False)
+    # pick_next counted that start, so the next one has to wait its turn
+    assert monitor.pick_next(deque([("X", False)]), ["Vendor.Heavy2"]) is None
@@ -0,0 +1,126 @@
+"""winget exit-code classification, the retry loop and the elevated batch, without winget or Tk."""
+import importlib.util
+import os
+import re
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(os.path.dirname(HERE), "App-Updater.py")
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("app_updater", APP)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+app = load_app()
+
+
+@pytest.mark.parametrize("code, outcome", [
+    (0, app.OUTCOME_SUCCESS),
+    (0x8A150061, app.OUTCOME_SUCCESS),
+    (0x8A150008, app.OUTCOME_RETRY),
+    (0x8A150019, app.OUTCOME_ELEVATE),
+    (740, app.OUTCOME_ELEVATE),
+    (3010, app.OUTCOME_REBOOT),
+    (0x8A150109, app.OUTCOME_REBOOT),
+    (0x8A15010D, app.OUTCOME_FATAL),
+    (0x8A150014, app.OUTCOME_FATAL),
+])
+def test_classify_winget_exit(code, outcome):
+    assert app.classify_winget_exit(code)[0] == outcome
+
+
+def test_classify_accepts_signed_hresults_and_unknown_codes():
+    assert app.classify_winget_exit(0x8A150008 - (1 << 32)) == app.classify_winget_exit(0x8A150008)
+    assert app.classify_winget_exit(0x8A15010D)[1] != "Unknown error"
+    assert app.classify_winget_exit(12345) == (app.OUTCOME_FATAL, "Unknown error")
+
+
+@pytest.fixture
+def fake_upgrade(monkeypatch):
+    """Replace winget with a list of exit codes (one per attempt) and record backoff sleeps."""
+    codes, calls, sleeps = [], [], []
+
+    def stream(pkg_id, include_unknown, on_line, should_cancel=lambda: False, on_start=None):
+        calls.append(pkg_id)
+        return codes.pop(0)
+
+    def sleep(seconds, should_cancel):
+        sleeps.append(seconds)
+        return should_cancel()
+
+    monkeypatch.setattr(app, "stream_winget_upgrade", stream)
+    monkeypatch.setattr(app, "_sleep_unless_cancelled", sleep)
+    monkeypatch.setattr(app, "RETRY_BASE_DELAY", 0.5)
+    monkeypatch.setattr(app, "RETRY_MAX_ATTEMPTS", 3)
+    return codes, calls, sleeps
+
+
+def test_retry_backs_off_until_success(fake_upgrade):
+    codes, calls, sleeps = fake_upgrade
+    codes += [0x8A150008, 0x8A150107, 0]
+    lines = []
+    assert app.upgrade_with_retry("Vendor.Foo", False, lines.append) == (app.OUTCOME_SUCCESS, 0, 3)
+    assert sleeps == [0.5, 1.0]
+    assert len(lines) == 2 and "attempt 2/3" in lines[0]
+
+
+def test_retry_gives_up_after_max_attempts(fake_upgrade):
+    codes, calls, sleeps = fake_upgrade
+    codes += [0x8A150008] * 5
+    assert app.upgrade_with_retry("Vendor.Foo", False, lambda ln: None) == \
+        (app.OUTCOME_RETRY, 0x8A150008, 3)
+    assert len(calls) == 3 and sleeps == [0.5, 1.0]
+
+
+def test_fatal_and_reboot_codes_are_not_retried(fake_upgrade):
+    codes, calls, sleeps = fake_upgrade
+    codes += [0x8A150014, 3010]
+    assert app.upgrade_with_retry("A", False, lambda ln: None) == (app.OUTCOME_FATAL, 0x8A150014, 1)
+    assert app.upgrade_with_retry("B", False, lambda ln: None) == (app.OUTCOME_REBOOT, 3010, 1)
+    assert sleeps == []
+
+
+def test_cancel_after_an_attempt(fake_upgrade):
+    codes, calls, sleeps = fake_upgrade
+    codes += [0x8A150008, 0]
+    assert app.upgrade_with_retry("Vendor.Foo", False, lambda ln: None, should_cancel=lambda: True) == \
+        (app.OUTCOME_CANCELLED, 0x8A150008, 1)
+    assert sleeps == []
+
+
+def test_cancel_during_backoff(fake_upgrade):
+    codes, calls, sleeps = fake_upgrade
+    codes += [0x8A150008, 0]
+    # Cancel arrives while waiting to retry
+    outcome = app.upgrade_with_retry("Vendor.Foo", False, lambda ln: None, should_cancel=lambda: bool(sleeps))
+    assert outcome == (app.OUTCOME_CANCELLED, 0x8A150008, 1)
+    assert len(calls) == 1
+
+
+def test_elevated_batch_reads_one_code_per_command(monkeypatch):
+    scripts = []
+
+    def fake_run(cmd):
+        # Play the elevated cmd.exe: find the script and the results file it appends to
+        script = re.search(r"'/c \"(.+?)\"'", cmd[-1]).group(1)
+        with open(script, encoding="utf-8") as f:
+            text = f.read()
+        scripts.append((script, text))
+        results = re.search(r'>>"(.+?)" echo', text).group(1)
+        with open(results, "a", encoding="utf-8") as f:
+            f.write(f"0\n{0x8A150011 - (1 << 32)}\nnot-a-number\n")
+        return 0, "", ""
+
+    monkeypatch.setattr(app, "run", fake_run)
+    cmds = [app.build_upgrade_cmd(p, False) for p in ("A", "B", "C", "D")]
+    assert app.run_elevated_batch(cmds) == [0, 0x8A150011, None, None]
+
+    script, text = scripts[0]
+    assert text.count("echo %errorlevel%") == 4
+    assert "winget upgrade --id A" in text
+    assert not os.path.exists(script)